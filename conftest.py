@@ -0,0 +1,21 @@
+import pytest
+
+
+@pytest.fixture(autouse=True, scope='session')
+def isolated_cache():
+    """Тесты pytest тоже не трогают кэш сервера разработки."""
+    from core.testing import isolated_cache
+
+    with isolated_cache():
+        yield
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """
+    Транзакция теста откатывается, и колбэки on_commit со сбросом
+    страниц не выполняются: каждый тест начинает с пустым кэшем.
+    """
+    from django.core.cache import cache
+
+    cache.clear()
@@ -0,0 +1,161 @@
+from django.contrib import admin
+from django.contrib.admin.views.main import ALL_VAR, ORDER_VAR, ChangeList
+from django.core.paginator import Paginator
+from django.db import connection
+from django.db.models import Max
+from django.utils.functional import cached_property
+
+from .paginator import NEXT, PREVIOUS
+
+CURSOR_VAR = 'cursor'
+# Точный подсчёт отфильтрованного списка обрывается на этом числе
+COUNT_LIMIT = 10000
+
+
+def estimate_count(model):
+    """
+    Примерное число строк таблицы без COUNT(*): статистика
+    планировщика, а в SQLite без ANALYZE — наибольший pk.
+    """
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE relname = %s', [table]
+            )
+            row = cursor.fetchone()
+            if row and row[0] > 0:
+                return int(row[0])
+        elif connection.vendor == 'sqlite':
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'"
+            )
+            if cursor.fetchone():
+                cursor.execute(
+                    'SELECT stat FROM sqlite_stat1 WHERE tbl = %s', [table]
+                )
+                row = cursor.fetchone()
+                if row:
+                    return int(row[0].split()[0])
+    return model._default_manager.aggregate(count=Max('pk'))['count'] or 0
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Паджинатор без полного COUNT(*): для всей таблицы число строк
+    оценивается, для отфильтрованного списка считается не дальше
+    COUNT_LIMIT.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            return estimate_count(queryset.model)
+        return queryset[:COUNT_LIMIT].count()
+
+
+class CursorChangeList(ChangeList):
+    """
+    Список объектов админки, который листается по pk от последней
+    показанной строки вместо ?p=N и OFFSET. При сортировке по
+    колонке список возвращается к обычным номерам страниц.
+    """
+
+    def __init__(self, request, *args, **kwargs):
+        self.cursor = request.GET.get(CURSOR_VAR)
+        super().__init__(request, *args, **kwargs)
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(CURSOR_VAR, None)
+        return lookup_params
+
+    def get_query_string(self, new_params=None, remove=None):
+        # Фильтры и сортировка начинают список с первой страницы
+        remove = [*(remove or []), CURSOR_VAR]
+        return super().get_query_string(new_params, remove)
+
+    def decode_cursor(self):
+        """Возвращает (направление, pk) или None для битого курсора."""
+        if not self.cursor:
+            return None
+        direction, pk = self.cursor[:1], self.cursor[1:]
+        if direction not in (NEXT, PREVIOUS) or not pk.isdigit():
+            return None
+        return direction, int(pk)
+
+    def get_results(self, request):
+        self.cursor_mode = (
+            ORDER_VAR not in self.params and ALL_VAR not in self.params
+        )
+        if not self.cursor_mode:
+            return super().get_results(request)
+        key = self.decode_cursor()
+        pks = self.queryset.order_by('-pk')
+        if key is not None:
+            direction, pk = key
+            if direction == NEXT:
+                pks = pks.filter(pk__lt=pk)
+            else:
+                pks = pks.filter(pk__gt=pk).reverse()
+        pks = list(pks.values_list('pk', flat=True)[:self.list_per_page + 1])
+        has_more = len(pks) > self.list_per_page
+        pks = sorted(pks[:self.list_per_page], reverse=True)
+        if key is None or key[0] == NEXT:
+            has_next, has_previous = has_more, key is not None
+        else:
+            has_next, has_previous = True, has_more
+        self.paginator = self.model_admin.get_paginator(
+            request, self.queryset, self.list_per_page
+        )
+        self.result_count = self.paginator.count
+        self.show_full_result_count = False
+        self.show_admin_actions = True
+        self.full_result_count = None
+        # Форма list_editable требует QuerySet, а не список
+        self.result_list = self.queryset.filter(pk__in=pks).order_by('-pk')
+        self.can_show_all = False
+        self.multi_page = has_next or has_previous
+        self.next_url = self.previous_url = None
+        if pks and has_next:
+            self.next_url = self.get_query_string(
+                {CURSOR_VAR: f'{NEXT}{pks[-1]}'}
+            )
+        if pks and has_previous:
+            self.previous_url = self.get_query_string(
+                {CURSOR_VAR: f'{PREVIOUS}{pks[0]}'}
+            )
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """
+    ModelAdmin для больших таблиц: курсорная паджинация, оценка
+    числа строк вместо COUNT(*) и общий на запрос список вариантов
+    для внешних ключей из cached_choice_fields, чтобы list_editable
+    не выбирал их заново для каждой строки.
+    """
+    ordering = ('-pk',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    change_list_template = 'admin/cursor_change_list.html'
+    cached_choice_fields = ()
+
+    def get_changelist(self, request, **kwargs):
+        return CursorChangeList
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        formfield = super().formfield_for_foreignkey(
+            db_field, request, **kwargs
+        )
+        if db_field.name in self.cached_choice_fields:
+            cached_choices = request.__dict__.setdefault(
+                '_cached_choices', {}
+            )
+            key = (self.model, db_field.name)
+            if key not in cached_choices:
+                # Через iter: list() спросил бы у вариантов __len__,
+                # а это лишний COUNT(*)
+                cached_choices[key] = list(iter(formfield.choices))
+            formfield.choices = cached_choices[key]
+        return formfield
@@ -0,0 +1,128 @@
+import math
+import random
+import time
+
+from django.core.cache import cache
+
+# Блокировка пересчёта снимается сама, если её владелец упал
+LOCK_TIMEOUT = 30
+# Сколько ждать чужого пересчёта, когда в кэше нет даже старого значения
+WAIT_TIMEOUT = 2
+WAIT_INTERVAL = 0.05
+
+
+def generation_key(name):
+    return f'generation:{name}'
+
+
+def get_generation(name):
+    """
+    Возвращает номер поколения name. Номер входит в ключи кэша,
+    поэтому после bump_generation старые записи больше не читаются.
+    """
+    key = generation_key(name)
+    generation = cache.get(key)
+    if generation is None:
+        # Начальное значение от времени: после вытеснения ключа
+        # новое поколение не совпадёт ни с одним из прежних
+        cache.add(key, int(time.time() * 1000), None)
+        generation = cache.get(key)
+    return generation
+
+
+def bump_generation(name):
+    """Увеличивает поколение name и возвращает новое."""
+    try:
+        return cache.incr(generation_key(name))
+    except ValueError:
+        return get_generation(name)
+
+
+def get_generations(names):
+    """Поколения нескольких имён одним get_many; недостающие заводятся."""
+    keys = {generation_key(name): name for name in names}
+    found = cache.get_many(keys)
+    generations = {keys[key]: value for key, value in found.items()}
+    for name in names:
+        if name not in generations:
+            generations[name] = get_generation(name)
+    return generations
+
+
+def lock_key(key):
+    return f'lock:{key}'
+
+
+def acquire_lock(key, timeout=LOCK_TIMEOUT):
+    """Блокировка пересчёта key: add успешен только у одного процесса."""
+    return cache.add(lock_key(key), True, timeout)
+
+
+def release_lock(key):
+    cache.delete(lock_key(key))
+
+
+def is_fresh(entry, version, beta):
+    """
+    Вероятностное досрочное обновление (XFetch): чем ближе срок
+    и чем дольше пересчёт, тем вероятнее, что запись сочтут старой
+    и пересчитают до истечения, пока остальные читают её из кэша.
+    """
+    _, entry_version, expires, delta = entry
+    if entry_version != version:
+        return False
+    return time.time() - delta * beta * math.log(1 - random.random()) < expires
+
+
+def compute_and_store(key, compute, timeout, version, stale_timeout):
+    started = time.monotonic()
+    value = compute()
+    delta = time.monotonic() - started
+    if timeout is None:
+        cache.set(key, (value, version, math.inf, delta), None)
+    else:
+        cache.set(
+            key,
+            (value, version, time.time() + timeout, delta),
+            timeout + stale_timeout
+        )
+    return value
+
+
+def get_or_compute(key, compute, timeout, version=None, stale_timeout=None,
+                   beta=1.0, on_stale=None):
+    """
+    Значение key из кэша или результат compute() с защитой от лавины
+    одновременных пересчётов.
+
+    Пересчитывает только получивший блокировку запрос, остальные до
+    конца пересчёта получают прежнее значение (stale-while-revalidate)
+    и вызывают on_stale. Прежним считается и значение другой версии,
+    поэтому версия поколения лучше ключа: смена поколения тоже не
+    вызывает лавину. Устаревшее значение хранится ещё stale_timeout
+    секунд (по умолчанию timeout).
+    """
+    if stale_timeout is None:
+        stale_timeout = timeout or 0
+    entry = cache.get(key)
+    if entry is not None and is_fresh(entry, version, beta):
+        return entry[0]
+    if acquire_lock(key):
+        try:
+            return compute_and_store(
+                key, compute, timeout, version, stale_timeout
+            )
+        finally:
+            release_lock(key)
+    if entry is not None:
+        if on_stale is not None:
+            on_stale()
+        return entry[0]
+    deadline = time.monotonic() + WAIT_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(WAIT_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None and entry[1] == version:
+            return entry[0]
+    # Пересчёт затянулся: считаем сами, не дожидаясь блокировки
+    return compute_and_store(key, compute, timeout, version, stale_timeout)
@@ -0,0 +1,38 @@
+"""
+Хранилище ключей sorl-thumbnail только в кэше Django.
+
+Штатное cached_db_kvstore на каждую новую миниатюру пишет строку
+в таблицу thumbnail_kvstore и при промахе кэша читает её. Запись
+здесь нужна лишь самой sorl: шаблоны берут размеры и адреса миниатюр
+из кэша posts.thumbnails, а при вытеснении ключа sorl проверяет файл
+в хранилище и не перестраивает готовую миниатюру.
+
+Перечислить ключи кэша нельзя, поэтому clear() и команда thumbnail
+cleanup ничего не находят; ненужные файлы удаляет gc_media.
+
+    THUMBNAIL_KVSTORE = 'core.kvstore.KVStore'
+"""
+from django.core.cache import InvalidCacheBackendError, cache, caches
+from sorl.thumbnail.conf import settings
+from sorl.thumbnail.kvstores.base import KVStoreBase
+
+
+class KVStore(KVStoreBase):
+    @property
+    def cache(self):
+        try:
+            return caches[settings.THUMBNAIL_CACHE]
+        except InvalidCacheBackendError:
+            return cache
+
+    def _get_raw(self, key):
+        return self.cache.get(key)
+
+    def _set_raw(self, key, value):
+        self.cache.set(key, value, settings.THUMBNAIL_CACHE_TIMEOUT)
+
+    def _delete_raw(self, *keys):
+        self.cache.delete_many(keys)
+
+    def _find_keys_raw(self, prefix):
+        return []
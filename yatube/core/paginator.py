@@ -0,0 +1,134 @@
+import base64
+
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+class CursorPaginator(Paginator):
+    """
+    Паджинатор по ключу (дата, pk).
+
+    Страница выбирается условием по индексу от последней показанной
+    записи, без COUNT(*) и OFFSET. Нумерованные страницы (get_page)
+    унаследованы от Paginator и остаются для старых ссылок ?page=N.
+    """
+
+    def __init__(self, object_list, per_page, date_field='pub_date',
+                 key_field='pk', **kwargs):
+        self.date_field = date_field
+        self.key_field = key_field
+        super().__init__(
+            object_list.order_by(f'-{date_field}', f'-{key_field}'),
+            per_page,
+            **kwargs
+        )
+
+    def encode_cursor(self, obj, direction):
+        date = getattr(obj, self.date_field).isoformat()
+        value = f'{direction}|{date}|{getattr(obj, self.key_field)}'
+        return base64.urlsafe_b64encode(value.encode()).decode()
+
+    def decode_cursor(self, cursor):
+        """Возвращает (направление, дата, pk) или None для битого курсора."""
+        try:
+            value = base64.urlsafe_b64decode(cursor.encode()).decode()
+            direction, date, pk = value.split('|')
+            date = parse_datetime(date)
+            pk = int(pk)
+        except ValueError:
+            return None
+        if direction not in (NEXT, PREVIOUS) or date is None:
+            return None
+        return direction, date, pk
+
+    def seek(self, queryset, key, key_field=None):
+        """
+        Ограничивает упорядоченный по убыванию queryset записями
+        после (NEXT) или перед (PREVIOUS) ключом; во втором случае
+        порядок обхода меняется на возрастающий.
+        """
+        if key is None:
+            return queryset
+        key_field = key_field or self.key_field
+        direction, date, pk = key
+        lookup = 'lt' if direction == NEXT else 'gt'
+        queryset = queryset.filter(
+            Q(**{f'{self.date_field}__{lookup}': date})
+            | Q(**{self.date_field: date, f'{key_field}__{lookup}': pk})
+        )
+        if direction == PREVIOUS:
+            queryset = queryset.reverse()
+        return queryset
+
+    def fetch(self, key):
+        """Возвращает до per_page + 1 записей в порядке обхода."""
+        return list(self.seek(self.object_list, key)[:self.per_page + 1])
+
+    def get_cursor_page(self, cursor=None):
+        """
+        Возвращает страницу после (или перед) курсором.
+        Пустой или некорректный курсор даёт первую страницу.
+        """
+        key = self.decode_cursor(cursor) if cursor else None
+        items = self.fetch(key)
+        has_more = len(items) > self.per_page
+        items = items[:self.per_page]
+        if key is None or key[0] == NEXT:
+            has_next, has_previous = has_more, key is not None
+        else:
+            items.reverse()
+            has_next, has_previous = True, has_more
+        page = Page(items, None, self)
+        page.cursor_mode = True
+        page.next_cursor = None
+        page.previous_cursor = None
+        if items and has_next:
+            page.next_cursor = self.encode_cursor(items[-1], NEXT)
+        if items and has_previous:
+            page.previous_cursor = self.encode_cursor(items[0], PREVIOUS)
+        return page
+
+
+class KeyCursorPaginator(CursorPaginator):
+    """
+    Паджинатор по одному ключу pk для таблиц без даты, например
+    подписок. С фильтром по внешнему ключу страница выбирается по
+    индексу (внешний ключ, pk).
+    """
+
+    def __init__(self, object_list, per_page, key_field='pk', **kwargs):
+        self.key_field = key_field
+        Paginator.__init__(
+            self, object_list.order_by(f'-{key_field}'), per_page, **kwargs
+        )
+
+    def encode_cursor(self, obj, direction):
+        value = f'{direction}|{getattr(obj, self.key_field)}'
+        return base64.urlsafe_b64encode(value.encode()).decode()
+
+    def decode_cursor(self, cursor):
+        """Возвращает (направление, pk) или None для битого курсора."""
+        try:
+            value = base64.urlsafe_b64decode(cursor.encode()).decode()
+            direction, pk = value.split('|')
+            pk = int(pk)
+        except ValueError:
+            return None
+        if direction not in (NEXT, PREVIOUS):
+            return None
+        return direction, pk
+
+    def seek(self, queryset, key, key_field=None):
+        if key is None:
+            return queryset
+        key_field = key_field or self.key_field
+        direction, pk = key
+        lookup = 'lt' if direction == NEXT else 'gt'
+        queryset = queryset.filter(**{f'{key_field}__{lookup}': pk})
+        if direction == PREVIOUS:
+            queryset = queryset.reverse()
+        return queryset
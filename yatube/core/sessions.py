@@ -0,0 +1,50 @@
+"""
+Движок сессий: чтение из общего кэша, запись в базу после ответа.
+
+Как и cached_db, сессия читается из кэша и только при промахе из
+django_session. Новая сессия (вход пользователя) сразу пишется и в
+базу, а изменения уже существующей попадают в кэш сразу, в базу же
+отложенно — по сигналу request_finished, когда ответ уже отдан.
+Вне запроса (shell, команды) запись идёт в базу немедленно.
+
+    SESSION_ENGINE = 'core.sessions'
+"""
+import threading
+
+from django.contrib.sessions.backends import cached_db, db
+from django.core.signals import request_finished, request_started
+from django.dispatch import receiver
+
+_pending = threading.local()
+
+
+class SessionStore(cached_db.SessionStore):
+    cache_key_prefix = 'core.sessions'
+
+    def save(self, must_create=False):
+        pending = getattr(_pending, 'stores', None)
+        if must_create or self.session_key is None or pending is None:
+            return super().save(must_create)
+        self._cache.set(self.cache_key, self._session, self.get_expiry_age())
+        pending[self.session_key] = self
+
+    def delete(self, session_key=None):
+        # Удалённая сессия не должна воскреснуть при отложенной записи
+        pending = getattr(_pending, 'stores', None)
+        if pending:
+            pending.pop(session_key or self.session_key, None)
+        super().delete(session_key)
+
+
+@receiver(request_started)
+def start_collecting(**kwargs):
+    _pending.stores = {}
+
+
+@receiver(request_finished)
+def persist_sessions(**kwargs):
+    stores = getattr(_pending, 'stores', None) or {}
+    _pending.stores = None
+    for store in stores.values():
+        if store.session_key is not None:
+            db.SessionStore.save(store)
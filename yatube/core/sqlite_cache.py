@@ -0,0 +1,362 @@
+"""
+Общий для процессов одного сервера кэш в файле SQLite.
+
+У LocMemCache каждый процесс WSGI-сервера держит свою копию кэша:
+сброс поколения в одном процессе не виден остальным. Здесь записи
+лежат в одной таблице в режиме WAL, поэтому читатели не ждут
+писателя. Целые числа хранятся как INTEGER, и incr выполняется одним
+UPDATE, атомарно для всех процессов; остальные значения хранятся
+в pickle. При переполнении вытесняются давно не читанные записи.
+
+Перед файлом стоит небольшой L1 в памяти процесса с коротким
+временем жизни: частые ключи вроде поколений лент не читаются из
+SQLite на каждом обращении, а изменения из других процессов видны
+не позже чем через L1_TIMEOUT секунд.
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.sqlite_cache.SQLiteCache',
+            'LOCATION': '/var/cache/yatube/cache.sqlite3',
+            'OPTIONS': {'MAX_ENTRIES': 100000, 'L1_TIMEOUT': 1},
+        },
+    }
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCHEMA = [
+    'CREATE TABLE IF NOT EXISTS cache ('
+    'key TEXT PRIMARY KEY, value BLOB, expires REAL, accessed REAL NOT NULL'
+    ') WITHOUT ROWID',
+    'CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)',
+]
+NOT_EXPIRED = '(expires IS NULL OR expires > ?)'
+# Метка LRU обновляется не чаще раза в столько секунд: иначе каждое
+# чтение становилось бы записью и ждало бы блокировку
+ACCESS_GRANULARITY = 60
+# Ограничение SQLite на число параметров запроса
+MAX_VARIABLES = 500
+BUSY_TIMEOUT = 5
+INTEGER_RANGE = range(-2 ** 63, 2 ** 63)
+
+# L1 общий для потоков процесса, по одному на файл кэша
+_local_layers = {}
+_local_layers_lock = threading.Lock()
+
+
+def encode(value):
+    if type(value) is int and value in INTEGER_RANGE:
+        return value
+    return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+
+def decode(stored):
+    if isinstance(stored, int):
+        return stored
+    return pickle.loads(stored)
+
+
+def chunked(items, size=MAX_VARIABLES):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def placeholders(items):
+    return ', '.join('?' * len(items))
+
+
+class LocalLayer:
+    """L1 процесса: LRU в памяти с коротким временем жизни записей."""
+
+    def __init__(self, timeout, max_entries):
+        self.timeout = timeout
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        """Возвращает (найдено, сохранённое значение)."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return False, None
+            stored, expires = entry
+            if expires <= time.time():
+                del self.entries[key]
+                return False, None
+            self.entries.move_to_end(key)
+            return True, stored
+
+    def set(self, key, stored, expires=None):
+        if self.timeout <= 0:
+            return
+        expires = min(
+            time.time() + self.timeout,
+            expires if expires is not None else float('inf')
+        )
+        with self.lock:
+            self.entries[key] = (stored, expires)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete(self, *keys):
+        with self.lock:
+            for key in keys:
+                self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+def get_local_layer(location, timeout, max_entries):
+    with _local_layers_lock:
+        if location not in _local_layers:
+            _local_layers[location] = LocalLayer(timeout, max_entries)
+        return _local_layers[location]
+
+
+class SQLiteCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._location = location
+        self._cull_check_interval = int(
+            options.get('CULL_CHECK_INTERVAL', 100)
+        )
+        self._writes = 0
+        self._l1 = get_local_layer(
+            location,
+            float(options.get('L1_TIMEOUT', 1)),
+            int(options.get('L1_MAX_ENTRIES', 1000))
+        )
+        self._connection = None
+        self._pid = None
+
+    def _connect(self):
+        # Соединение не переживает fork: дочерний процесс открывает своё
+        if self._connection is None or self._pid != os.getpid():
+            connection = sqlite3.connect(
+                self._location,
+                timeout=BUSY_TIMEOUT,
+                isolation_level=None,
+                check_same_thread=False
+            )
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            for sql in SCHEMA:
+                connection.execute(sql)
+            self._connection = connection
+            self._pid = os.getpid()
+        return self._connection
+
+    @contextmanager
+    def _transaction(self):
+        connection = self._connect()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield connection
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _fetch(self, keys):
+        """Сохранённые значения ключей: из L1, остальные одним SELECT."""
+        found = {}
+        missing = []
+        for key in keys:
+            hit, stored = self._l1.get(key)
+            if hit:
+                found[key] = stored
+            else:
+                missing.append(key)
+        if not missing:
+            return found
+        now = time.time()
+        connection = self._connect()
+        stale = []
+        for chunk in chunked(missing):
+            rows = connection.execute(
+                'SELECT key, value, expires, accessed FROM cache'
+                f' WHERE key IN ({placeholders(chunk)}) AND {NOT_EXPIRED}',
+                [*chunk, now]
+            ).fetchall()
+            for key, stored, expires, accessed in rows:
+                found[key] = stored
+                self._l1.set(key, stored, expires)
+                if accessed < now - ACCESS_GRANULARITY:
+                    stale.append(key)
+        for chunk in chunked(stale):
+            connection.execute(
+                'UPDATE cache SET accessed = ?'
+                f' WHERE key IN ({placeholders(chunk)})',
+                [now, *chunk]
+            )
+        return found
+
+    def _store(self, items, timeout):
+        """Записывает пары (ключ, значение) одной транзакцией."""
+        now = time.time()
+        expires = self.get_backend_timeout(timeout)
+        rows = [(key, encode(value), expires, now) for key, value in items]
+        with self._transaction() as connection:
+            connection.executemany(
+                'INSERT OR REPLACE INTO cache (key, value, expires, accessed)'
+                ' VALUES (?, ?, ?, ?)',
+                rows
+            )
+        for key, stored, _, _ in rows:
+            self._l1.set(key, stored, expires)
+        self._written(len(rows))
+
+    def _written(self, count):
+        self._writes += count
+        if self._writes >= self._cull_check_interval:
+            self._writes = 0
+            self.cull()
+
+    def cull(self):
+        """
+        Удаляет просроченные записи, а при переполнении — долю
+        1/CULL_FREQUENCY давно не читанных.
+        """
+        with self._transaction() as connection:
+            connection.execute(
+                'DELETE FROM cache WHERE expires <= ?', [time.time()]
+            )
+            count = connection.execute(
+                'SELECT count(*) FROM cache'
+            ).fetchone()[0]
+            if count < self._max_entries:
+                return
+            if self._cull_frequency == 0:
+                connection.execute('DELETE FROM cache')
+            else:
+                connection.execute(
+                    'DELETE FROM cache WHERE key IN ('
+                    'SELECT key FROM cache ORDER BY accessed LIMIT ?)',
+                    [count // self._cull_frequency]
+                )
+        # Вытесненные записи не должны читаться из L1
+        self._l1.clear()
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        expires = self.get_backend_timeout(timeout)
+        stored = encode(value)
+        # Просроченная запись заменяется, живая остаётся
+        added = self._connect().execute(
+            'INSERT INTO cache (key, value, expires, accessed)'
+            ' VALUES (?, ?, ?, ?) ON CONFLICT (key) DO UPDATE SET'
+            ' value = excluded.value, expires = excluded.expires,'
+            ' accessed = excluded.accessed'
+            ' WHERE cache.expires IS NOT NULL AND cache.expires <= ?',
+            [key, stored, expires, now, now]
+        ).rowcount
+        if added:
+            self._l1.set(key, stored, expires)
+            self._written(1)
+        return bool(added)
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        found = self._fetch([key])
+        if key not in found:
+            return default
+        return decode(found[key])
+
+    def get_many(self, keys, version=None):
+        keys = {self._key(key, version): key for key in keys}
+        return {
+            keys[key]: decode(stored)
+            for key, stored in self._fetch(list(keys)).items()
+        }
+
+    def has_key(self, key, version=None):
+        key = self._key(key, version)
+        return key in self._fetch([key])
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._store([(self._key(key, version), value)], timeout)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        self._store(
+            [(self._key(key, version), value) for key, value in data.items()],
+            timeout
+        )
+        return []
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        self._l1.delete(key)
+        return bool(self._connect().execute(
+            f'UPDATE cache SET expires = ? WHERE key = ? AND {NOT_EXPIRED}',
+            [self.get_backend_timeout(timeout), key, now]
+        ).rowcount)
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version)
+
+    def delete_many(self, keys, version=None):
+        keys = [self._key(key, version) for key in keys]
+        self._l1.delete(*keys)
+        with self._transaction() as connection:
+            for chunk in chunked(keys):
+                connection.execute(
+                    f'DELETE FROM cache WHERE key IN ({placeholders(chunk)})',
+                    chunk
+                )
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        connection = self._connect()
+        row = connection.execute(
+            'UPDATE cache SET value = value + ?'
+            " WHERE key = ? AND typeof(value) = 'integer'"
+            f' AND {NOT_EXPIRED} RETURNING value, expires',
+            [delta, key, now]
+        ).fetchall()
+        if row:
+            value, expires = row[0]
+        else:
+            # Не целое в INTEGER: прибавляем в Python под блокировкой
+            with self._transaction() as connection:
+                row = connection.execute(
+                    f'SELECT value, expires FROM cache'
+                    f' WHERE key = ? AND {NOT_EXPIRED}',
+                    [key, now]
+                ).fetchone()
+                if row is None:
+                    raise ValueError(f"Key '{key}' not found")
+                value, expires = decode(row[0]) + delta, row[1]
+                connection.execute(
+                    'UPDATE cache SET value = ? WHERE key = ?',
+                    [encode(value), key]
+                )
+        self._l1.set(key, encode(value), expires)
+        return value
+
+    def clear(self):
+        self._connect().execute('DELETE FROM cache')
+        self._l1.clear()
+
+    def close(self, **kwargs):
+        # Соединение потока остаётся открытым между запросами
+        pass
@@ -0,0 +1,67 @@
+import hashlib
+import os
+import uuid
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+HASH_CHUNK_SIZE = 64 * 1024
+# posts/ab/cd/abcd….jpg: 65536 каталогов по ~15 файлов на миллион картинок
+SHARD_DEPTH = 2
+SHARD_WIDTH = 2
+
+
+def content_hash(content):
+    """SHA-256 содержимого файла, читаемого по частям."""
+    digest = hashlib.sha256()
+    content.seek(0)
+    for chunk in content.chunks(HASH_CHUNK_SIZE):
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Хранилище, в котором имя файла — хеш его содержимого.
+
+    Одинаковые загрузки сохраняются один раз и получают одно имя,
+    поэтому и миниатюры строятся для них один раз. Файл пишется
+    под временным именем и атомарно переименовывается, так что
+    параллельные загрузки одного содержимого не мешают друг другу.
+    Файлы раскладываются по вложенным каталогам из первых символов
+    хеша, чтобы ни один каталог не разрастался. Неиспользуемые файлы
+    удаляет команда gc_media.
+    """
+
+    def content_name(self, name, content):
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        digest = content_hash(content)
+        shards = [
+            digest[level * SHARD_WIDTH:(level + 1) * SHARD_WIDTH]
+            for level in range(SHARD_DEPTH)
+        ]
+        return os.path.join(directory, *shards, digest + extension)
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.content_name(name, content)
+        if self.exists(name):
+            # Свежая метка защищает файл от сборщика мусора, пока
+            # ссылающийся на него пост ещё не сохранён
+            os.utime(self.path(name))
+            return name
+        directory, filename = os.path.split(name)
+        temporary = super().save(
+            os.path.join(directory, f'.{uuid.uuid4().hex}.{filename}'),
+            content,
+            max_length
+        )
+        os.replace(self.path(temporary), self.path(name))
+        return name
@@ -0,0 +1,72 @@
+from django import template
+from django.core.cache.utils import make_template_fragment_key
+
+from core.cache import get_or_compute
+
+register = template.Library()
+
+
+class StampedeCacheNode(template.Node):
+    def __init__(self, nodelist, timeout, name, vary_on, version):
+        self.nodelist = nodelist
+        self.timeout = timeout
+        self.name = name
+        self.vary_on = vary_on
+        self.version = version
+
+    def render(self, context):
+        timeout = self.timeout.resolve(context)
+        if timeout is not None and not isinstance(timeout, int):
+            raise template.TemplateSyntaxError(
+                f'"stampede_cache" tag got a non-integer timeout value: '
+                f'{timeout!r}'
+            )
+        key = make_template_fragment_key(
+            self.name, [var.resolve(context) for var in self.vary_on]
+        )
+        version = self.version.resolve(context) if self.version else None
+        request = context.get('request')
+
+        def served_stale():
+            # Страницу со старым фрагментом нельзя класть в кэш страниц
+            if request is not None:
+                request.cache_served_stale = True
+
+        return get_or_compute(
+            key,
+            lambda: self.nodelist.render(context),
+            timeout,
+            version=version,
+            on_stale=served_stale
+        )
+
+
+@register.tag('stampede_cache')
+def do_stampede_cache(parser, token):
+    """
+    Фрагментный кэш с защитой от лавины пересчётов (core.cache):
+
+        {% stampede_cache timeout name [vary_on ...] [version=var] %}
+            ...
+        {% endstampede_cache %}
+
+    Смена version не меняет ключ: пока один запрос перерисовывает
+    фрагмент, остальные получают прежний.
+    """
+    nodelist = parser.parse(('endstampede_cache',))
+    parser.delete_first_token()
+    bits = token.split_contents()
+    if len(bits) < 3:
+        raise template.TemplateSyntaxError(
+            f"'{bits[0]}' tag requires at least 2 arguments."
+        )
+    version = None
+    if bits[-1].startswith('version='):
+        version = parser.compile_filter(bits.pop()[len('version='):])
+    return StampedeCacheNode(
+        nodelist,
+        parser.compile_filter(bits[1]),
+        bits[2],
+        [parser.compile_filter(bit) for bit in bits[3:]],
+        version
+    )
@@ -0,0 +1,96 @@
+import copy
+import os
+import shutil
+import tempfile
+from contextlib import ContextDecorator, ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.runner import DiscoverRunner
+from django.test.utils import CaptureQueriesContext, override_settings
+
+
+class QueryBudget(ContextDecorator):
+    """
+    Проверяет, что код выполняет не больше max_queries запросов к БД.
+    Работает и как контекстный менеджер, и как декоратор:
+
+        with QueryBudget(5):
+            client.get('/')
+    """
+
+    def __init__(self, max_queries, using=DEFAULT_DB_ALIAS):
+        self.max_queries = max_queries
+        self.using = using
+
+    def __enter__(self):
+        self.context = CaptureQueriesContext(connections[self.using])
+        return self.context.__enter__()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.context.__exit__(exc_type, exc_value, traceback)
+        if exc_type is not None:
+            return False
+        executed = len(self.context)
+        if executed > self.max_queries:
+            queries = '\n'.join(
+                f'{number}. {query["sql"]}'
+                for number, query in enumerate(
+                    self.context.captured_queries, start=1
+                )
+            )
+            raise AssertionError(
+                f'Выполнено запросов: {executed}, '
+                f'бюджет: {self.max_queries}\n{queries}'
+            )
+        return False
+
+
+@contextmanager
+def run_on_commit(using=DEFAULT_DB_ALIAS):
+    """
+    Выполняет колбэки transaction.on_commit, зарегистрированные в блоке.
+    TestCase оборачивает тест в транзакцию, которая не фиксируется,
+    поэтому сами они не вызываются (аналог captureOnCommitCallbacks
+    из Django 3.2):
+
+        with run_on_commit():
+            post.save()
+    """
+    connection = connections[using]
+    start = len(connection.run_on_commit)
+    yield
+    # Колбэк может зарегистрировать новые, поэтому длину не кэшируем
+    while start < len(connection.run_on_commit):
+        _, callback = connection.run_on_commit[start]
+        start += 1
+        callback()
+
+
+@contextmanager
+def isolated_cache():
+    """
+    Файл кэша во временном каталоге: тесты, в том числе их
+    cache.clear(), не трогают кэш сервера разработки.
+    """
+    directory = tempfile.mkdtemp(prefix='yatube-cache-')
+    caches = copy.deepcopy(settings.CACHES)
+    caches['default']['LOCATION'] = os.path.join(directory, 'cache.sqlite3')
+    try:
+        with override_settings(CACHES=caches):
+            yield
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+class TestRunner(DiscoverRunner):
+    """manage.py test с отдельным кэшем (isolated_cache)."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.cache_stack = ExitStack()
+        self.cache_stack.enter_context(isolated_cache())
+
+    def teardown_test_environment(self, **kwargs):
+        self.cache_stack.close()
+        super().teardown_test_environment(**kwargs)
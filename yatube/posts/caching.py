@@ -0,0 +1,161 @@
+"""
+Версионированный фрагментный кэш лент.
+
+Версия фрагмента — поколение ленты, которое увеличивается при
+сохранении и удалении постов, комментариев и групп (posts.signals),
+а ключ включает текущую страницу или курсор. Поэтому время жизни
+фрагментов можно держать большим: устаревшая версия перерисовывается
+при первом чтении.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.safestring import mark_safe
+
+from core.cache import bump_generation, get_generation, get_generations
+
+from .thumbnails import resolve_thumbnails
+from .variants import resolve_pictures
+
+FEED_GENERATION = 'feed'
+FEED_CHANGED_KEY = 'feed_changed'
+POST_CARD_TEMPLATE = 'posts/includes/post_list.html'
+
+
+def bump_feed_generation():
+    """
+    Новое поколение лент после фиксации транзакции: иначе фрагмент,
+    отрисованный до фиксации, сохранился бы под новым поколением.
+    """
+    def bump():
+        bump_generation(FEED_GENERATION)
+        cache.set(FEED_CHANGED_KEY, timezone.now(), None)
+    transaction.on_commit(bump)
+
+
+def get_feed_generation():
+    return get_generation(FEED_GENERATION)
+
+
+def get_feed_changed():
+    """Время последнего изменения лент или None, если оно неизвестно."""
+    return cache.get(FEED_CHANGED_KEY)
+
+
+def get_follow_generation(user_id):
+    """Поколение ленты подписок: меняется при подписке и отписке."""
+    return get_generation(f'follow:{user_id}')
+
+
+def bump_follow_generation(user_id):
+    return bump_generation(f'follow:{user_id}')
+
+
+def get_followers_generation(author_id):
+    """Поколение подписчиков автора: меняется при подписке на него."""
+    return get_generation(f'followers:{author_id}')
+
+
+def bump_followers_generation(author_id):
+    return bump_generation(f'followers:{author_id}')
+
+
+def get_feed_cache_context(request, *vary_on, per_viewer=False):
+    """
+    Переменные для
+    {% stampede_cache cache_timeout <имя> cache_key version=cache_version %}.
+    Поколение входит в версию, а не в ключ: после его смены старый
+    фрагмент отдаётся, пока один запрос рисует новый (core.cache).
+    С per_viewer фрагмент вошедшего пользователя свой и обновляется
+    при его подписках и отписках.
+    """
+    parts = [
+        *vary_on,
+        request.GET.get('page', ''),
+        request.GET.get('cursor', ''),
+    ]
+    version = [get_feed_generation()]
+    if per_viewer and request.user.is_authenticated:
+        parts.append(f'viewer:{request.user.pk}')
+        version.append(get_follow_generation(request.user.pk))
+    return {
+        'cache_timeout': getattr(settings, 'FEED_CACHE_TIMEOUT', 60 * 60),
+        'cache_key': ':'.join(str(part) for part in parts),
+        'cache_version': ':'.join(str(part) for part in version),
+    }
+
+
+def card_generation_names(post):
+    """
+    Поколения автора и группы: карточка показывает имя автора
+    и ссылку на группу, которые меняются без изменения поста.
+    """
+    names = [f'card_author:{post.author_id}']
+    if post.group_id:
+        names.append(f'card_group:{post.group_id}')
+    return names
+
+
+def bump_author_cards(author_id):
+    # После фиксации, как и bump_feed_generation
+    transaction.on_commit(
+        lambda: bump_generation(f'card_author:{author_id}')
+    )
+
+
+def bump_group_cards(group_id):
+    transaction.on_commit(
+        lambda: bump_generation(f'card_group:{group_id}')
+    )
+
+
+def post_card_key(post, generations=None):
+    names = card_generation_names(post)
+    if generations is None:
+        generations = get_generations(names)
+    stamps = ':'.join(str(generations[name]) for name in names)
+    return f'post_card:{post.pk}:{post.modified.timestamp()}:{stamps}'
+
+
+def post_card_keys(posts):
+    """Ключи карточек постов: поколения читаются одним get_many."""
+    generations = get_generations({
+        name for post in posts for name in card_generation_names(post)
+    })
+    return [post_card_key(post, generations) for post in posts]
+
+
+def invalidate_post_card(post):
+    cache.delete(post_card_key(post))
+
+
+def get_post_cards(posts):
+    """
+    Возвращает HTML карточек постов в исходном порядке.
+    Поколения авторов и групп страницы и сами карточки читаются из
+    кэша двумя get_many; отрисовываются и сохраняются одним set_many
+    только промахи.
+    """
+    posts = list(posts)
+    keys = dict(zip((post.pk for post in posts), post_card_keys(posts)))
+    cards = cache.get_many(list(keys.values()))
+    missing_posts = resolve_pictures(
+        post for post in posts if keys[post.pk] not in cards
+    )
+    # Миниатюра sorl нужна, только пока нет адаптивных вариантов
+    resolve_thumbnails(post for post in missing_posts if not post.picture)
+    missing = {
+        keys[post.pk]: render_to_string(
+            POST_CARD_TEMPLATE, {'post': post}
+        )
+        for post in missing_posts
+    }
+    if missing:
+        cache.set_many(
+            missing,
+            getattr(settings, 'POST_CARD_CACHE_TIMEOUT', 24 * 60 * 60)
+        )
+        cards.update(missing)
+    return [mark_safe(cards[keys[post.pk]]) for post in posts]
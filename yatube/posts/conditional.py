@@ -0,0 +1,114 @@
+"""
+Валидаторы условных GET-запросов для лент и страницы поста.
+
+ETag собирается из поколения лент (posts.caching), параметров
+страницы и зрителя, поэтому неизменившаяся страница получает 304
+без запросов ленты и отрисовки шаблона. Максимальный pub_date сам
+по себе не годится: он не меняется при правке и удалении постов,
+а поколение увеличивают сигналы на любое изменение.
+
+Last-Modified отдаётся только анонимам: страницы вошедших
+пользователей зависят от зрителя и сверяются по ETag. У профиля
+его нет совсем: счётчики подписок меняются без смены поколения.
+
+Валидаторы считаются от текущего поколения, а кэш на время
+перерисовки может отдать прежнюю страницу или фрагмент: такой ответ
+уходит без них (conditional), иначе браузер сверял бы старое
+содержимое с новым ETag и получал 304 до следующей смены поколения.
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.views.decorators.http import condition
+
+from .caching import (
+    get_feed_changed, get_feed_generation, get_follow_generation
+)
+
+User = get_user_model()
+
+
+def get_viewer(request):
+    """
+    Часть ETag, зависящая от зрителя: шапка, кнопки и значки
+    подписок зависят от пользователя и его подписок, формы — от
+    CSRF-токена.
+    """
+    user = request.user
+    if user.is_authenticated:
+        viewer = f'{user.pk}:{get_follow_generation(user.pk)}'
+    else:
+        viewer = 'anonymous'
+    return ':'.join([
+        viewer,
+        request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''),
+    ])
+
+
+def make_etag(request, *parts):
+    parts = [
+        get_feed_generation(),
+        *parts,
+        request.GET.get('page', ''),
+        request.GET.get('cursor', ''),
+        get_viewer(request),
+    ]
+    value = ':'.join(str(part) for part in parts)
+    return hashlib.md5(value.encode()).hexdigest()
+
+
+def index_etag(request):
+    return make_etag(request, 'index')
+
+
+def group_etag(request, slug):
+    return make_etag(request, 'group', slug)
+
+
+def profile_etag(request, username):
+    # Счётчики подписок меняются без смены поколения лент, поэтому
+    # автор читается здесь; представление берёт его из запроса
+    author = User.objects.select_related('stats').filter(
+        username=username
+    ).first()
+    request.profile_author = author
+    stats = getattr(author, 'stats', None)
+    if stats is not None:
+        stats = (
+            stats.posts_count, stats.followers_count, stats.following_count
+        )
+    return make_etag(request, 'profile', username, stats)
+
+
+def post_etag(request, post_id):
+    return make_etag(request, 'post', post_id)
+
+
+def feed_last_modified(request, *args, **kwargs):
+    if request.user.is_authenticated:
+        return None
+    return get_feed_changed()
+
+
+def conditional(etag_func=None, last_modified_func=None):
+    """
+    condition из django.views.decorators.http, который снимает
+    ETag и Last-Modified с ответа, собранного из устаревшего кэша
+    (request.cache_served_stale).
+    """
+    def decorator(view):
+        view = condition(
+            etag_func=etag_func, last_modified_func=last_modified_func
+        )(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = view(request, *args, **kwargs)
+            if getattr(request, 'cache_served_stale', False):
+                del response['ETag']
+                del response['Last-Modified']
+            return response
+        return wrapper
+    return decorator
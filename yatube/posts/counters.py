@@ -0,0 +1,59 @@
+"""
+Денормализованные счётчики.
+
+Число постов, подписчиков и подписок пользователя хранится в UserStats,
+число комментариев к посту — в Post.comment_count. Счётчики меняются
+сигналами (posts.signals) в транзакции пишущего view; накопившиеся
+расхождения исправляет команда reconcile_counters.
+"""
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Post, UserStats
+
+
+def increment_user_stat(user_id, field):
+    updated = UserStats.objects.filter(user_id=user_id).update(
+        **{field: F(field) + 1}
+    )
+    if not updated:
+        stats, created = UserStats.objects.get_or_create(
+            user_id=user_id,
+            defaults={field: 1}
+        )
+        if not created:
+            increment_user_stat(user_id, field)
+
+
+def decrement_user_stat(user_id, field):
+    UserStats.objects.filter(
+        user_id=user_id,
+        **{f'{field}__gt': 0}
+    ).update(**{field: F(field) - 1})
+
+
+def increment_comment_count(post_id):
+    Post.objects.filter(pk=post_id).update(
+        comment_count=F('comment_count') + 1
+    )
+
+
+def decrement_comment_count(post_id):
+    Post.objects.filter(
+        pk=post_id,
+        comment_count__gt=0
+    ).update(comment_count=F('comment_count') - 1)
+
+
+def count_subquery(model, field):
+    """Число записей model, у которых field ссылается на внешнюю строку."""
+    return Coalesce(
+        Subquery(
+            model.objects.filter(
+                **{field: OuterRef('pk')}
+            ).order_by().values(field).annotate(
+                total=Count('pk')
+            ).values('total')
+        ),
+        0
+    )
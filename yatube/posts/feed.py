@@ -0,0 +1,217 @@
+"""
+Материализованная лента подписок.
+
+Новый пост раскладывается (fan-out) по лентам подписчиков автора,
+страница /follow/ читает готовый отсортированный список постов.
+Длина ленты ограничена настройкой FOLLOW_FEED_LENGTH.
+
+Стратегия выбирается настройкой FOLLOW_FEED_STRATEGY:
+- 'push' — все посты раскладываются по лентам при записи;
+- 'hybrid' — посты авторов, у которых не меньше
+  FOLLOW_FEED_CELEBRITY_THRESHOLD подписчиков, не раскладываются,
+  а читаются при показе ленты и сливаются с материализованной частью.
+"""
+import heapq
+from itertools import islice
+
+from django.conf import settings
+from django.db import connection
+from django.utils.functional import cached_property
+
+from core.paginator import NEXT, CursorPaginator
+
+from .models import FeedEntry, Follow, Post, UserStats
+
+PUSH = 'push'
+HYBRID = 'hybrid'
+# Лент, обрезаемых одним запросом (с запасом до лимита параметров SQLite)
+TRIM_BATCH_SIZE = 500
+
+
+def get_feed_length():
+    return getattr(settings, 'FOLLOW_FEED_LENGTH', 1000)
+
+
+def get_strategy():
+    return getattr(settings, 'FOLLOW_FEED_STRATEGY', PUSH)
+
+
+def get_celebrity_threshold():
+    return getattr(settings, 'FOLLOW_FEED_CELEBRITY_THRESHOLD', 10000)
+
+
+def is_pulled(author_id):
+    """Посты автора читаются при показе ленты, а не раскладываются."""
+    if get_strategy() != HYBRID:
+        return False
+    return UserStats.objects.filter(
+        user_id=author_id,
+        followers_count__gte=get_celebrity_threshold()
+    ).exists()
+
+
+def pulled_author_ids(user):
+    """Авторы из подписок пользователя, чьи посты читаются напрямую."""
+    if get_strategy() != HYBRID:
+        return []
+    return list(
+        Follow.objects.filter(
+            user=user,
+            author__stats__followers_count__gte=get_celebrity_threshold()
+        ).values_list('author_id', flat=True)
+    )
+
+
+def trim_feeds(user_ids):
+    """
+    Удаляет из лент пользователей записи старше FOLLOW_FEED_LENGTH
+    последних: один DELETE с нумерацией записей внутри каждой ленты
+    на пачку из TRIM_BATCH_SIZE пользователей.
+    """
+    table = FeedEntry._meta.db_table
+    user_ids = list(user_ids)
+    with connection.cursor() as cursor:
+        for start in range(0, len(user_ids), TRIM_BATCH_SIZE):
+            batch = user_ids[start:start + TRIM_BATCH_SIZE]
+            placeholders = ', '.join(['%s'] * len(batch))
+            cursor.execute(
+                f'DELETE FROM {table} WHERE id IN ('
+                'SELECT id FROM (SELECT id, ROW_NUMBER() OVER ('
+                'PARTITION BY user_id ORDER BY pub_date DESC, post_id DESC'
+                f') AS position FROM {table} WHERE user_id IN ({placeholders})'
+                ') ranked WHERE position > %s)',
+                [*batch, get_feed_length()]
+            )
+
+
+def trim_feed(user_id):
+    """Удаляет из ленты записи старше FOLLOW_FEED_LENGTH последних."""
+    trim_feeds([user_id])
+
+
+def push_post(post):
+    """Добавляет новый пост в ленты всех подписчиков автора."""
+    if is_pulled(post.author_id):
+        return
+    follower_ids = list(
+        Follow.objects.filter(
+            author_id=post.author_id
+        ).values_list('user_id', flat=True)
+    )
+    FeedEntry.objects.bulk_create(
+        [
+            FeedEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+            for user_id in follower_ids
+        ],
+        ignore_conflicts=True
+    )
+    trim_feeds(follower_ids)
+
+
+def add_author(user_id, author_id):
+    """Заполняет ленту последними постами автора после подписки."""
+    if is_pulled(author_id):
+        return
+    posts = Post.objects.filter(
+        author_id=author_id
+    ).order_by('-pub_date').values_list('pk', 'pub_date')[:get_feed_length()]
+    FeedEntry.objects.bulk_create(
+        [
+            FeedEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+            for post_id, pub_date in posts
+        ],
+        ignore_conflicts=True
+    )
+    trim_feed(user_id)
+
+
+def rebuild_feed(user_id):
+    """Заново строит ленту пользователя по его текущим подпискам."""
+    FeedEntry.objects.filter(user_id=user_id).delete()
+    authors = Follow.objects.filter(user_id=user_id)
+    if get_strategy() == HYBRID:
+        authors = authors.exclude(
+            author__stats__followers_count__gte=get_celebrity_threshold()
+        )
+    posts = Post.objects.filter(
+        author_id__in=authors.values('author_id')
+    ).order_by('-pub_date', '-pk').values_list('pk', 'pub_date')
+    FeedEntry.objects.bulk_create(
+        [
+            FeedEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+            for post_id, pub_date in posts[:get_feed_length()]
+        ]
+    )
+
+
+def remove_author(user_id, author_id):
+    """Убирает из ленты посты автора после отписки."""
+    FeedEntry.objects.filter(
+        user_id=user_id,
+        post__author_id=author_id
+    ).delete()
+
+
+def sort_key(entry):
+    return entry.pub_date, entry.post_id
+
+
+class HybridFeedPaginator(CursorPaginator):
+    """
+    Паджинатор гибридной ленты: материализованные записи сливаются
+    k-way слиянием по (pub_date, post_id) с постами популярных авторов,
+    каждый из которых читается отдельной выборкой по индексу.
+    Элементы страницы — FeedEntry (для прочитанных постов несохранённые).
+    """
+
+    def __init__(self, entries, pulled_posts, per_page):
+        self.pulled_posts = [
+            posts.order_by('-pub_date', '-pk').only('pub_date')
+            for posts in pulled_posts
+        ]
+        super().__init__(entries, per_page, key_field='post_id')
+
+    def merge(self, key, limit):
+        streams = [self.seek(self.object_list, key)[:limit]]
+        for posts in self.pulled_posts:
+            streams.append([
+                FeedEntry(post_id=post.pk, pub_date=post.pub_date)
+                for post in self.seek(posts, key, key_field='pk')[:limit]
+            ])
+        merged = heapq.merge(
+            *streams,
+            key=sort_key,
+            reverse=key is None or key[0] == NEXT
+        )
+        return list(islice(merged, limit))
+
+    def fetch(self, key):
+        return self.merge(key, self.per_page + 1)
+
+    @cached_property
+    def count(self):
+        return self.object_list.count() + sum(
+            posts.count() for posts in self.pulled_posts
+        )
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        top = bottom + self.per_page
+        if top + self.orphans >= self.count:
+            top = self.count
+        return self._get_page(self.merge(None, top)[bottom:], number, self)
+
+
+def get_paginator(user, per_page):
+    """Возвращает паджинатор ленты подписок по текущей стратегии."""
+    entries = FeedEntry.objects.filter(user=user).only('post_id', 'pub_date')
+    author_ids = pulled_author_ids(user)
+    if not author_ids:
+        return CursorPaginator(entries, per_page, key_field='post_id')
+    return HybridFeedPaginator(
+        # Записи, разложенные до того, как автор стал популярным
+        entries.exclude(post__author_id__in=author_ids),
+        [Post.objects.filter(author_id=author_id) for author_id in author_ids],
+        per_page
+    )
@@ -0,0 +1,155 @@
+"""
+Граф подписок в памяти процесса.
+
+Для пользователя хранится отсортированный массив pk авторов, на
+которых он подписан, для автора — массив pk подписчиков. Массивы
+читаются из posts_follow при первом обращении, проверка подписки —
+двоичный поиск, число подписок и подписчиков — длина массива.
+
+Каждый массив помечен поколением (posts.caching): подписка и отписка
+увеличивают поколения обоих пользователей после фиксации транзакции.
+До фиксации другой процесс прочитал бы из базы старый массив и
+сохранил его под уже новым поколением. Процесс, в котором сохранили
+Follow, после фиксации правит свои массивы на месте (posts.signals),
+а остальные процессы при чтении видят новое поколение и перечитывают
+массив из базы. Массивы не изменяются после создания, поэтому
+читаются без блокировки.
+"""
+import threading
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import transaction
+
+from .caching import (
+    bump_followers_generation, bump_follow_generation,
+    get_followers_generation, get_follow_generation
+)
+from .models import Follow
+
+
+def contains(ids, value):
+    index = bisect_left(ids, value)
+    return index < len(ids) and ids[index] == value
+
+
+def with_id(ids, value):
+    index = bisect_left(ids, value)
+    if index < len(ids) and ids[index] == value:
+        return ids
+    return ids[:index] + array('q', [value]) + ids[index:]
+
+
+def without_id(ids, value):
+    index = bisect_left(ids, value)
+    if index == len(ids) or ids[index] != value:
+        return ids
+    return ids[:index] + ids[index + 1:]
+
+
+class Adjacency:
+    """Массивы соседей одной стороны графа: LRU по pk пользователя."""
+
+    def __init__(self, column, key_field, get_generation, bump_generation):
+        self.column = column
+        self.key_field = key_field
+        self.get_generation = get_generation
+        self.bump_generation = bump_generation
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        generation = self.get_generation(key)
+        with self.lock:
+            entry = self.entries.get(key)
+            # Без общего кэша поколений нет, и массивам не верим
+            if (
+                entry is not None
+                and generation is not None
+                and entry[0] == generation
+            ):
+                self.entries.move_to_end(key)
+                return entry[1]
+        # Поколение прочитано до базы: изменение во время чтения
+        # не потеряется, массив просто перечитают ещё раз
+        ids = array('q', Follow.objects.filter(
+            **{self.key_field: key}
+        ).order_by(self.column).values_list(self.column, flat=True))
+        with self.lock:
+            self.entries[key] = (generation, ids)
+            self.entries.move_to_end(key)
+            max_users = getattr(settings, 'FOLLOW_GRAPH_MAX_USERS', 10000)
+            while len(self.entries) > max_users:
+                self.entries.popitem(last=False)
+        return ids
+
+    def change(self, key, value, update):
+        generation = self.bump_generation(key)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return
+            if generation is None or entry[0] != generation - 1:
+                # Между чтением и правкой массив менял другой процесс
+                del self.entries[key]
+                return
+            self.entries[key] = (generation, update(entry[1], value))
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class FollowGraph:
+    def __init__(self):
+        self.following = Adjacency(
+            'author_id', 'user_id',
+            get_follow_generation, bump_follow_generation
+        )
+        self.followers = Adjacency(
+            'user_id', 'author_id',
+            get_followers_generation, bump_followers_generation
+        )
+
+    def is_following(self, user_id, author_id):
+        return contains(self.following.get(user_id), author_id)
+
+    def following_among(self, user_id, author_ids):
+        """
+        Те из author_ids, на кого подписан user_id: одна проверка
+        поколения на всю страницу.
+        """
+        ids = self.following.get(user_id)
+        return {
+            author_id for author_id in author_ids
+            if contains(ids, author_id)
+        }
+
+    def following_count(self, user_id):
+        return len(self.following.get(user_id))
+
+    def followers_count(self, author_id):
+        return len(self.followers.get(author_id))
+
+    def add(self, user_id, author_id):
+        transaction.on_commit(
+            lambda: self.change(user_id, author_id, with_id)
+        )
+
+    def remove(self, user_id, author_id):
+        transaction.on_commit(
+            lambda: self.change(user_id, author_id, without_id)
+        )
+
+    def change(self, user_id, author_id, update):
+        self.following.change(user_id, author_id, update)
+        self.followers.change(author_id, user_id, update)
+
+    def clear(self):
+        self.following.clear()
+        self.followers.clear()
+
+
+graph = FollowGraph()
@@ -1,4 +1,6 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
+from .images import ingest_image
 from .models import Comment, Post
 from django.core.exceptions import ValidationError
 
@@ -14,6 +16,13 @@ class PostForm(forms.ModelForm):
             raise ValidationError('Заполните поле "Текст поста"')
         return text
 
+    def clean_image(self):
+        image = self.cleaned_data['image']
+        # Уже сохранённую картинку при редактировании не трогаем
+        if isinstance(image, UploadedFile):
+            return ingest_image(image)
+        return image
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
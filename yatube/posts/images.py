@@ -0,0 +1,112 @@
+"""
+Приём картинок постов.
+
+Загрузки больше FILE_UPLOAD_MAX_MEMORY_SIZE Django пишет во временный
+файл по частям, поэтому картинка целиком в память не читается. Здесь
+она открывается лениво (читается только заголовок): JPEG сразу
+декодируется в уменьшенном масштабе (draft), остальные форматы
+уменьшаются через reduce. Метаданные отбрасываются перекодированием.
+Картинки, которые не нужно ни уменьшать, ни очищать, сохраняются как есть.
+"""
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from PIL import Image, ImageOps
+
+# Форматы, которые сохраняются без смены формата
+KEEP_FORMATS = {
+    'JPEG': 'jpg',
+    'PNG': 'png',
+    'GIF': 'gif',
+    'WEBP': 'webp',
+}
+METADATA_KEYS = ('exif', 'xmp', 'XML:com.adobe.xmp', 'comment')
+
+
+def get_max_size():
+    return getattr(settings, 'POST_IMAGE_MAX_SIZE', 2048)
+
+
+def get_max_pixels():
+    return getattr(settings, 'POST_IMAGE_MAX_PIXELS', 50_000_000)
+
+
+def get_quality():
+    return getattr(settings, 'POST_IMAGE_QUALITY', 85)
+
+
+def has_metadata(image):
+    return any(image.info.get(key) for key in METADATA_KEYS)
+
+
+def get_output_format(image, source_format):
+    if source_format in KEEP_FORMATS:
+        return source_format
+    if 'A' in image.getbands() or 'transparency' in image.info:
+        return 'PNG'
+    return 'JPEG'
+
+
+def encode(image, output_format, icc_profile):
+    """Кодирует картинку во временный файл, в памяти — только небольшие."""
+    # PNG и GIF иначе берут метаданные из image.info
+    for key in METADATA_KEYS:
+        image.info.pop(key, None)
+    options = {}
+    if icc_profile:
+        options['icc_profile'] = icc_profile
+    if output_format == 'JPEG':
+        if image.mode not in ('RGB', 'L', 'CMYK'):
+            image = image.convert('RGB')
+        options.update(
+            quality=get_quality(), optimize=True, progressive=True
+        )
+    elif output_format == 'WEBP':
+        options['quality'] = get_quality()
+    elif output_format == 'PNG':
+        options['optimize'] = True
+    output = tempfile.SpooledTemporaryFile(
+        max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE
+    )
+    image.save(output, output_format, **options)
+    output.seek(0)
+    return output
+
+
+def ingest_image(upload):
+    """
+    Возвращает файл для сохранения в Post.image: исходную загрузку
+    или уменьшенную до POST_IMAGE_MAX_SIZE и очищенную копию.
+    """
+    max_size = get_max_size()
+    upload.seek(0)
+    try:
+        image = Image.open(upload)
+        source_format = image.format
+        width, height = image.size
+        if width * height > get_max_pixels():
+            raise ValidationError(
+                'Слишком большая картинка: %(width)s×%(height)s',
+                params={'width': width, 'height': height}
+            )
+        if (
+            source_format in KEEP_FORMATS
+            and max(width, height) <= max_size
+            and not has_metadata(image)
+        ):
+            upload.seek(0)
+            return upload
+        icc_profile = image.info.get('icc_profile')
+        # Для JPEG декодер сразу отдаёт картинку в 1/2…1/8 масштаба
+        image.draft(image.mode, (max_size, max_size))
+        image.thumbnail((max_size, max_size), reducing_gap=2.0)
+        image = ImageOps.exif_transpose(image)
+        output_format = get_output_format(image, source_format)
+        output = encode(image, output_format, icc_profile)
+    except (OSError, SyntaxError, Image.DecompressionBombError):
+        raise ValidationError('Не удалось обработать картинку')
+    name, _ = os.path.splitext(os.path.basename(upload.name))
+    return File(output, name=f'{name}.{KEEP_FORMATS[output_format]}')
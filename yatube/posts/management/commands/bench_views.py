@@ -0,0 +1,250 @@
+import json
+import math
+import time
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, reset_queries, transaction
+from django.test import Client
+from django.test.utils import (
+    CaptureQueriesContext, override_settings, setup_databases,
+    teardown_databases
+)
+from django.urls import reverse
+
+from posts.models import Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+BENCH_USERNAME = 'bench_user'
+FOLLOWED_AUTHORS = 20
+# Отдельный кэш замера: --cold не должен очищать общий кэш сайта
+BENCH_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'bench_views',
+    }
+}
+
+
+def percentile(values, percent):
+    """Перцентиль методом ближайшего ранга."""
+    ordered = sorted(values)
+    rank = max(math.ceil(percent / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет задержку, число запросов и объём ответа страниц постов'
+        ' через тестовый клиент; сравнивает результат с базовым.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--datasets',
+            nargs='*',
+            type=int,
+            default=[],
+            help=(
+                'Размеры наборов (число постов), например 10000 100000'
+                ' 1000000. Каждый набор создаётся в тестовой базе командой'
+                ' seed_yatube; без параметра замеряется текущая база в'
+                ' транзакции, которая затем откатывается.'
+            )
+        )
+        parser.add_argument('--requests', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument(
+            '--cold',
+            action='store_true',
+            help='Очищать кэш перед каждым запросом.'
+        )
+        parser.add_argument(
+            '--skip-writes',
+            action='store_true',
+            help='Не замерять пишущие страницы.'
+        )
+        parser.add_argument('--output', help='Файл для результатов (JSON).')
+        parser.add_argument('--baseline', help='Базовые результаты (JSON).')
+        parser.add_argument(
+            '--tolerance',
+            type=float,
+            default=0.2,
+            help='Допустимый рост p95 относительно базового (доля).'
+        )
+
+    def handle(self, *args, **options):
+        results = {}
+        if options['datasets']:
+            for size in options['datasets']:
+                results[str(size)] = self.bench_dataset(size, options)
+        else:
+            results['current'] = self.bench(options)
+
+        for dataset, views in results.items():
+            self.stdout.write(f'Набор {dataset}:')
+            for view, stats in views.items():
+                self.stdout.write(
+                    f'  {view:<16} p50 {stats["p50_ms"]:8.2f} мс'
+                    f'  p95 {stats["p95_ms"]:8.2f} мс'
+                    f'  p99 {stats["p99_ms"]:8.2f} мс'
+                    f'  запросов {stats["queries"]:3}'
+                    f'  байт {stats["bytes"]}'
+                )
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(results, output, ensure_ascii=False, indent=2)
+        if options['baseline']:
+            with open(options['baseline']) as baseline:
+                regressions = self.compare(
+                    results, json.load(baseline), options['tolerance']
+                )
+            if regressions:
+                raise CommandError(
+                    'Регрессии относительно базового замера:\n'
+                    + '\n'.join(regressions)
+                )
+
+    def bench_dataset(self, size, options):
+        """Замер на отдельной тестовой базе, заполненной seed_yatube."""
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            call_command(
+                'seed_yatube',
+                posts=size,
+                users=max(size // 100, 10),
+                comments=size // 2,
+                follows=max(size // 50, 10),
+                skip_feeds=True,
+                stdout=StringIO()
+            )
+            return self.bench(options)
+        finally:
+            teardown_databases(old_config, verbosity=0)
+
+    def bench(self, options):
+        """
+        Замер с отдельным кэшем в памяти и в транзакции, которая
+        откатывается: пользователь бенчмарка, его подписки, посты
+        и комментарии не остаются в базе.
+        """
+        with override_settings(CACHES=BENCH_CACHES), transaction.atomic():
+            try:
+                return self.run_bench(options)
+            finally:
+                transaction.set_rollback(True)
+
+    def run_bench(self, options):
+        user, _ = User.objects.get_or_create(username=BENCH_USERNAME)
+        popular = UserStats.objects.exclude(user=user).order_by(
+            '-followers_count'
+        ).values_list('user_id', flat=True)[:FOLLOWED_AUTHORS]
+        for author_id in popular:
+            Follow.objects.get_or_create(user=user, author_id=author_id)
+        post = Post.objects.order_by('-comment_count').first()
+        group = Group.objects.filter(posts__isnull=False).first()
+        if post is None or group is None:
+            raise CommandError(
+                'В базе нет постов с группой: заполните её seed_yatube.'
+            )
+        author = post.author
+        client = Client()
+        client.force_login(user)
+
+        targets = {
+            'index': lambda: client.get(reverse('posts:index')),
+            'group_posts': lambda: client.get(
+                reverse('posts:group_list', args=[group.slug])
+            ),
+            'profile': lambda: client.get(
+                reverse('posts:profile', args=[author.username])
+            ),
+            'post_detail': lambda: client.get(
+                reverse('posts:post_detail', args=[post.pk])
+            ),
+            'follow_index': lambda: client.get(reverse('posts:follow_index')),
+        }
+        cleanups = {}
+        if not options['skip_writes']:
+            targets.update({
+                'post_create': lambda: client.post(
+                    reverse('posts:post_create'), {'text': 'Бенчмарк'}
+                ),
+                'add_comment': lambda: client.post(
+                    reverse('posts:add_comment', args=[post.pk]),
+                    {'text': 'Бенчмарк'}
+                ),
+                'profile_follow': lambda: client.get(
+                    reverse('posts:profile_follow', args=[author.username])
+                ),
+            })
+            # Подписка замеряется каждый раз с нуля
+            cleanups['profile_follow'] = lambda: client.get(
+                reverse('posts:profile_unfollow', args=[author.username])
+            )
+            cleanups['profile_follow']()
+        try:
+            return {
+                name: self.measure(target, cleanups.get(name), options)
+                for name, target in targets.items()
+            }
+        finally:
+            # Каскадом удаляются подписки, посты и комментарии
+            user.delete()
+
+    def measure(self, target, cleanup, options):
+        for _ in range(options['warmup']):
+            target()
+            if cleanup:
+                cleanup()
+        timings, queries, sizes = [], [], []
+        for _ in range(options['requests']):
+            if options['cold']:
+                cache.clear()
+            # Журнал запросов ограничен 9000 записями: без сброса
+            # CaptureQueriesContext на заполненном журнале видит ноль
+            reset_queries()
+            with CaptureQueriesContext(connection) as context:
+                start = time.perf_counter()
+                response = target()
+                elapsed = time.perf_counter() - start
+            if cleanup:
+                cleanup()
+            if response.status_code >= 400:
+                raise CommandError(
+                    f'{response.request["PATH_INFO"]} вернул '
+                    f'{response.status_code}'
+                )
+            timings.append(elapsed * 1000)
+            queries.append(len(context))
+            sizes.append(len(response.content))
+        return {
+            'p50_ms': percentile(timings, 50),
+            'p95_ms': percentile(timings, 95),
+            'p99_ms': percentile(timings, 99),
+            'queries': max(queries),
+            'bytes': max(sizes),
+        }
+
+    def compare(self, results, baseline, tolerance):
+        regressions = []
+        for dataset, views in results.items():
+            for view, stats in views.items():
+                base = baseline.get(dataset, {}).get(view)
+                if base is None:
+                    continue
+                if stats['p95_ms'] > base['p95_ms'] * (1 + tolerance):
+                    regressions.append(
+                        f'{dataset}/{view}: p95 {stats["p95_ms"]:.2f} мс'
+                        f' (было {base["p95_ms"]:.2f} мс)'
+                    )
+                if stats['queries'] > base['queries']:
+                    regressions.append(
+                        f'{dataset}/{view}: запросов {stats["queries"]}'
+                        f' (было {base["queries"]})'
+                    )
+        return regressions
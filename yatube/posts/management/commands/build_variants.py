@@ -0,0 +1,111 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+
+from posts import caching, pagecache, thumbnails, variants
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Строит адаптивные варианты для уже загруженных картинок постов'
+        ' в пуле процессов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=variants.get_workers(),
+            help='Число процессов; 0 — строить в текущем процессе.'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Сколько картинок одновременно стоит в очереди пула.'
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Перестроить варианты, даже если они уже есть.'
+        )
+
+    def handle(self, *args, **options):
+        names = Post.objects.exclude(image='').order_by('image').values_list(
+            'image', flat=True
+        ).distinct()
+        executor = None
+        if options['workers']:
+            executor = ProcessPoolExecutor(
+                max_workers=options['workers'],
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        batch = []
+        built = failed = 0
+        try:
+            for name in names.iterator():
+                if not thumbnails.source_exists(name):
+                    continue
+                if not options['force'] and variants.read_manifest(name):
+                    continue
+                batch.append(name)
+                if len(batch) == options['batch_size']:
+                    result = self.build(batch, executor)
+                    built, failed = built + result[0], failed + result[1]
+                    batch = []
+            if batch:
+                result = self.build(batch, executor)
+                built, failed = built + result[0], failed + result[1]
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        if built:
+            # Карточки и ленты могли сохранить разметку без <picture>
+            caching.bump_feed_generation()
+            pagecache.purge_all()
+        self.stdout.write(f'Построено вариантов: {built}, ошибок: {failed}')
+
+    def build(self, names, executor):
+        """Строит варианты пачки картинок и обновляет кэш."""
+        manifests = {}
+        failed = 0
+        if executor is not None:
+            futures = {
+                executor.submit(
+                    variants.build_variants,
+                    *variants.build_arguments(name)
+                ): name
+                for name in names
+            }
+            for future in as_completed(futures):
+                try:
+                    manifests[futures[future]] = future.result()
+                except Exception as error:
+                    failed += 1
+                    self.stderr.write(f'{futures[future]}: {error}')
+        else:
+            for name in names:
+                try:
+                    manifests[name] = variants.build_variants(
+                        *variants.build_arguments(name)
+                    )
+                except Exception as error:
+                    failed += 1
+                    self.stderr.write(f'{name}: {error}')
+        cache.set_many(
+            {
+                variants.variants_key(name): manifest
+                for name, manifest in manifests.items()
+            },
+            None
+        )
+        # В ключ карточки входят поколения автора и группы
+        cache.delete_many(caching.post_card_keys(
+            Post.objects.filter(image__in=list(manifests)).only(
+                'pk', 'modified', 'author_id', 'group_id'
+            )
+        ))
+        return len(manifests), failed
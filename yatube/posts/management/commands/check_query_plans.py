@@ -0,0 +1,95 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from core.paginator import NEXT, PREVIOUS, CursorPaginator
+from posts.feed import get_feed_length
+from posts.models import Comment, FeedEntry, Follow, Post
+from posts.views import NUMBER_OF_POSTS_DISPLAYED
+
+# Полный проход по таблице: «SCAN posts_post» без «USING ... INDEX»
+FULL_SCAN = re.compile(r'^SCAN (TABLE )?\w+$')
+TEMP_SORT = 'TEMP B-TREE'
+
+
+class Command(BaseCommand):
+    help = (
+        'Проверяет планы запросов лент и страниц постов (EXPLAIN QUERY PLAN):'
+        ' полный проход по таблице или сортировка во временном B-дереве'
+        ' считаются ошибкой.'
+    )
+
+    def get_querysets(self):
+        """Запросы в том виде, в каком их строят views и posts.feed."""
+        posts = Post.objects.select_related('author', 'group')
+        entries = FeedEntry.objects.filter(user_id=1).only(
+            'post_id', 'pub_date'
+        )
+        paginators = {
+            'index': CursorPaginator(posts, NUMBER_OF_POSTS_DISPLAYED),
+            'group_posts': CursorPaginator(
+                posts.filter(group_id=1), NUMBER_OF_POSTS_DISPLAYED
+            ),
+            'profile': CursorPaginator(
+                posts.filter(author_id=1), NUMBER_OF_POSTS_DISPLAYED
+            ),
+            'follow_index': CursorPaginator(
+                entries, NUMBER_OF_POSTS_DISPLAYED, key_field='post_id'
+            ),
+        }
+        querysets = {}
+        now = timezone.now()
+        for name, paginator in paginators.items():
+            limit = paginator.per_page + 1
+            for direction in (None, NEXT, PREVIOUS):
+                key = direction and (direction, now, 1)
+                querysets[f'{name} [{direction or "first"}]'] = (
+                    paginator.seek(paginator.object_list, key)[:limit]
+                )
+        querysets.update({
+            'post_detail comments': Comment.objects.select_related(
+                'author'
+            ).filter(post_id=1),
+            'profile is_follower': Follow.objects.filter(
+                user_id=1, author_id=2
+            )[:1],
+            'feed followers': Follow.objects.filter(
+                author_id=1
+            ).values_list('user_id', flat=True),
+            'feed trim': FeedEntry.objects.filter(user_id=1).order_by(
+                '-pub_date', '-post_id'
+            ).values('pk')[get_feed_length():],
+            'feed remove author': FeedEntry.objects.filter(
+                user_id=1, post__author_id=2
+            ).values('pk'),
+        })
+        return querysets
+
+    def explain(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Команда поддерживает только SQLite.')
+        failed = []
+        for name, queryset in self.get_querysets().items():
+            plan = self.explain(queryset)
+            bad = [
+                detail for detail in plan
+                if FULL_SCAN.match(detail) or TEMP_SORT in detail
+            ]
+            self.stdout.write(f'{name}:')
+            for detail in plan:
+                mark = '!!' if detail in bad else '  '
+                self.stdout.write(f'  {mark} {detail}')
+            if bad:
+                failed.append(name)
+        if failed:
+            raise CommandError(
+                'Запросы без подходящего индекса: ' + ', '.join(failed)
+            )
@@ -0,0 +1,100 @@
+import os
+import shutil
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from sorl.thumbnail import delete as delete_thumbnails
+
+from posts import thumbnails, variants
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет картинки постов, на которые не ссылается ни один пост,'
+        ' вместе с их миниатюрами и вариантами.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--grace',
+            type=int,
+            default=60 * 60,
+            help=(
+                'Не трогать файлы моложе стольких секунд: пост, который'
+                ' на них сошлётся, может быть ещё не сохранён.'
+            )
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать, что было бы удалено.'
+        )
+
+    def handle(self, *args, **options):
+        self.storage = Post._meta.get_field('image').storage
+        self.options = options
+        self.deadline = time.time() - options['grace']
+        self.removed = 0
+        batch = []
+        for name in self.walk(Post._meta.get_field('image').upload_to):
+            batch.append(name)
+            if len(batch) == options['batch_size']:
+                self.collect(batch)
+                batch = []
+        if batch:
+            self.collect(batch)
+        verb = 'Будет удалено' if options['dry_run'] else 'Удалено'
+        self.stdout.write(f'{verb} файлов: {self.removed}')
+
+    def walk(self, directory):
+        """Имена файлов каталога хранилища, включая вложенные."""
+        if not self.storage.exists(directory):
+            return
+        directories, files = self.storage.listdir(directory)
+        for filename in files:
+            yield os.path.join(directory, filename)
+        for subdirectory in directories:
+            yield from self.walk(os.path.join(directory, subdirectory))
+
+    def collect(self, names):
+        names = [name for name in names if not self.is_fresh(name)]
+        # Поиск по индексу image, без сортировки по умолчанию
+        referenced = set(
+            Post.objects.filter(image__in=names).order_by().values_list(
+                'image', flat=True
+            )
+        )
+        for name in names:
+            # Повторная проверка: файл могли переиспользовать после выборки
+            if name in referenced or self.is_fresh(name):
+                continue
+            self.removed += 1
+            if self.options['dry_run']:
+                self.stdout.write(name)
+                continue
+            if os.path.basename(name).startswith('.'):
+                # Недописанный временный файл
+                self.storage.delete(name)
+                continue
+            self.delete(name)
+
+    def is_fresh(self, name):
+        return os.path.getmtime(self.storage.path(name)) >= self.deadline
+
+    def delete(self, name):
+        """Удаляет файл, его миниатюры, варианты и их записи в кэше."""
+        keys = [variants.variants_key(name)]
+        for geometry, options in thumbnails.GEOMETRIES.values():
+            thumbnail = thumbnails.backend.get_thumbnail_file(
+                name, geometry, **options
+            )
+            keys.append(thumbnails.thumbnail_key(thumbnail))
+        cache.delete_many(keys)
+        delete_thumbnails(name)
+        shutil.rmtree(
+            self.storage.path(variants.get_variants_dir(name)),
+            ignore_errors=True
+        )
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import search
+
+
+class Command(BaseCommand):
+    help = (
+        'Восстанавливает таблицу и триггеры полнотекстового поиска'
+        ' и заново индексирует тексты постов.'
+    )
+
+    def handle(self, *args, **options):
+        if not search.is_supported():
+            raise CommandError('Полнотекстовый индекс есть только в SQLite.')
+        search.rebuild_index()
+        self.stdout.write('Поисковый индекс перестроен.')
@@ -0,0 +1,60 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max, Min
+
+from posts.counters import count_subquery
+from posts.models import Comment, Follow, Post, UserStats
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает денормализованные счётчики постов и пользователей.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=10000,
+            help='Сколько строк пересчитывать в одной транзакции.'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        missing = User.objects.filter(
+            stats__isnull=True
+        ).values_list('pk', flat=True)
+        UserStats.objects.bulk_create(
+            [UserStats(user_id=user_id) for user_id in missing],
+            ignore_conflicts=True
+        )
+        users = self.reconcile(
+            UserStats.objects.all(),
+            batch_size,
+            posts_count=count_subquery(Post, 'author'),
+            followers_count=count_subquery(Follow, 'author'),
+            following_count=count_subquery(Follow, 'user'),
+        )
+        posts = self.reconcile(
+            Post.objects.all(),
+            batch_size,
+            comment_count=count_subquery(Comment, 'post'),
+        )
+        self.stdout.write(
+            f'Пересчитано счётчиков: пользователей {users}, постов {posts}'
+        )
+
+    def reconcile(self, queryset, batch_size, **counters):
+        """Обновляет счётчики диапазонами pk, по транзакции на диапазон."""
+        bounds = queryset.aggregate(first=Min('pk'), last=Max('pk'))
+        if bounds['first'] is None:
+            return 0
+        updated = 0
+        for start in range(bounds['first'], bounds['last'] + 1, batch_size):
+            with transaction.atomic():
+                updated += queryset.filter(
+                    pk__gte=start,
+                    pk__lt=start + batch_size
+                ).update(**counters)
+        return updated
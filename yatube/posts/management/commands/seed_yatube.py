@@ -0,0 +1,275 @@
+import random
+from datetime import timedelta
+from io import BytesIO
+from itertools import accumulate
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+from faker import Faker
+from PIL import Image
+
+from posts import feed, search
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+# Размер пула заранее сгенерированных текстов: Faker на каждую
+# запись слишком медленный для миллионов постов
+TEXT_POOL_SIZE = 2000
+IMAGE_POOL_SIZE = 20
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу синтетическими пользователями, группами, постами,'
+        ' комментариями и подписками для нагрузочных замеров.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=50)
+        parser.add_argument('--posts', type=int, default=100000)
+        parser.add_argument('--comments', type=int, default=200000)
+        parser.add_argument('--follows', type=int, default=20000)
+        parser.add_argument(
+            '--image-ratio',
+            type=float,
+            default=0.0,
+            help='Доля постов с картинкой (0 — без картинок).'
+        )
+        parser.add_argument(
+            '--author-skew',
+            type=float,
+            default=1.1,
+            help='Показатель степенного распределения постов по авторам.'
+        )
+        parser.add_argument('--days', type=int, default=365)
+        parser.add_argument('--batch-size', type=int, default=10000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--skip-feeds',
+            action='store_true',
+            help='Не строить ленты подписок после заполнения.'
+        )
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.fake = Faker('ru_RU')
+        self.fake.seed_instance(options['seed'])
+        self.batch_size = options['batch_size']
+        self.now = timezone.now()
+        self.period = timedelta(days=options['days'])
+        # PRAGMA нельзя менять внутри транзакции (например, в тестах)
+        if connection.vendor == 'sqlite' and not connection.in_atomic_block:
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA synchronous = OFF')
+
+        user_ids = self.create_users(options['users'])
+        group_ids = self.create_groups(options['groups'])
+        # Авторы упорядочены по «популярности»: вес i-го равен 1 / i^skew
+        authors = self.random.sample(user_ids, len(user_ids))
+        author_weights = list(accumulate(
+            1 / rank ** options['author_skew']
+            for rank in range(1, len(authors) + 1)
+        ))
+        # Индекс поиска строится один раз после загрузки постов
+        with search.suspended_index():
+            post_ids = self.create_posts(
+                options['posts'],
+                authors,
+                author_weights,
+                group_ids,
+                options['image_ratio']
+            )
+        self.create_comments(options['comments'], user_ids, post_ids)
+        readers = self.create_follows(
+            options['follows'], user_ids, authors, author_weights
+        )
+
+        call_command(
+            'reconcile_counters',
+            batch_size=self.batch_size,
+            stdout=self.stdout
+        )
+        if not options['skip_feeds']:
+            for user_id in sorted(readers):
+                feed.rebuild_feed(user_id)
+            self.stdout.write(f'Лент подписок построено: {len(readers)}')
+
+    def random_date(self):
+        return self.now - self.period * self.random.random()
+
+    def db_date(self, value):
+        return connection.ops.adapt_datetimefield_value(value)
+
+    def bulk_insert(self, model, fields, rows):
+        """
+        Вставляет кортежи значений полей fields пачками через
+        executemany и возвращает диапазон pk: экземпляры моделей
+        на каждую строку не создаются, поэтому значения уже должны
+        быть в виде для базы.
+        """
+        first = (model.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+        quote = connection.ops.quote_name
+        columns = ', '.join(
+            quote(model._meta.get_field(name).column) for name in fields
+        )
+        placeholders = ', '.join(['%s'] * len(fields))
+        sql = ' '.join([
+            connection.ops.insert_statement(ignore_conflicts=True),
+            f'{quote(model._meta.db_table)} ({columns})',
+            f'VALUES ({placeholders})',
+            connection.ops.ignore_conflicts_suffix_sql(ignore_conflicts=True),
+        ])
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == self.batch_size:
+                self.insert(sql, batch)
+                batch = []
+        if batch:
+            self.insert(sql, batch)
+        last = model.objects.aggregate(last=Max('pk'))['last'] or 0
+        self.stdout.write(
+            f'{model._meta.verbose_name_plural}: {last - first + 1}'
+        )
+        return range(first, last + 1)
+
+    def insert(self, sql, batch):
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.executemany(sql, batch)
+
+    def create_users(self, count):
+        password = make_password(None)
+        first_names = [self.fake.first_name() for _ in range(TEXT_POOL_SIZE)]
+        last_names = [self.fake.last_name() for _ in range(TEXT_POOL_SIZE)]
+        date_joined = self.db_date(self.now)
+        offset = User.objects.count()
+        return list(self.bulk_insert(
+            User,
+            (
+                'username', 'password', 'first_name', 'last_name', 'email',
+                'is_superuser', 'is_staff', 'is_active', 'date_joined',
+            ),
+            (
+                (
+                    f'seed_user_{offset + number}',
+                    password,
+                    self.random.choice(first_names),
+                    self.random.choice(last_names),
+                    '',
+                    False,
+                    False,
+                    True,
+                    date_joined,
+                )
+                for number in range(count)
+            )
+        ))
+
+    def create_groups(self, count):
+        offset = Group.objects.count()
+        return list(self.bulk_insert(
+            Group,
+            ('title', 'slug', 'description'),
+            (
+                (
+                    self.fake.catch_phrase()[:200],
+                    f'seed-group-{offset + number}',
+                    self.fake.paragraph(),
+                )
+                for number in range(count)
+            )
+        ))
+
+    def create_images(self):
+        """
+        Сохраняет небольшой пул картинок, общий для всех постов, через
+        хранилище поля Post.image: имена и каталоги те же, что у
+        загруженных пользователями картинок.
+        """
+        field = Post._meta.get_field('image')
+        names = []
+        for number in range(IMAGE_POOL_SIZE):
+            color = tuple(self.random.randrange(256) for _ in range(3))
+            content = BytesIO()
+            Image.new('RGB', (1200, 800), color).save(content, 'JPEG')
+            names.append(field.storage.save(
+                field.generate_filename(None, f'seed_{number}.jpg'),
+                ContentFile(content.getvalue())
+            ))
+        return names
+
+    def create_posts(self, count, authors, author_weights, group_ids,
+                     image_ratio):
+        texts = [self.fake.text() for _ in range(TEXT_POOL_SIZE)]
+        groups = group_ids + [None] * len(group_ids)
+        images = self.create_images() if image_ratio > 0 else []
+
+        def generate():
+            for author_id in self.random.choices(
+                authors, cum_weights=author_weights, k=count
+            ):
+                pub_date = self.db_date(self.random_date())
+                image = ''
+                if images and self.random.random() < image_ratio:
+                    image = self.random.choice(images)
+                yield (
+                    self.random.choice(texts),
+                    author_id,
+                    self.random.choice(groups) if groups else None,
+                    image,
+                    pub_date,
+                    pub_date,
+                    0,
+                )
+
+        return self.bulk_insert(
+            Post,
+            (
+                'text', 'author', 'group', 'image', 'pub_date', 'modified',
+                'comment_count',
+            ),
+            generate()
+        )
+
+    def create_comments(self, count, user_ids, post_ids):
+        if not post_ids:
+            return
+        texts = [self.fake.sentence() for _ in range(TEXT_POOL_SIZE)]
+        self.bulk_insert(
+            Comment,
+            ('post', 'author', 'text', 'pub_date'),
+            (
+                (
+                    self.random.choice(post_ids),
+                    self.random.choice(user_ids),
+                    self.random.choice(texts),
+                    self.db_date(self.random_date()),
+                )
+                for _ in range(count)
+            )
+        )
+
+    def create_follows(self, count, user_ids, authors, author_weights):
+        """Подписки тяготеют к популярным авторам; возвращает читателей."""
+        if len(user_ids) < 2:
+            return set()
+        pairs = set()
+        attempts = 0
+        while len(pairs) < count and attempts < count * 10:
+            attempts += 1
+            user_id = self.random.choice(user_ids)
+            author_id = self.random.choices(
+                authors, cum_weights=author_weights
+            )[0]
+            if user_id != author_id:
+                pairs.add((user_id, author_id))
+        self.bulk_insert(Follow, ('user', 'author'), sorted(pairs))
+        return {user_id for user_id, _ in pairs}
@@ -0,0 +1,74 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Case, F, Value, When
+from django.db.models.functions import Now
+
+from core.storage import SHARD_DEPTH, SHARD_WIDTH
+from posts import caching, pagecache
+from posts.models import Post
+
+SHARDED = (
+    r'^[^/]+/' + rf'[0-9a-f]{{{SHARD_WIDTH}}}/' * SHARD_DEPTH
+    + r'[0-9a-f]{64}\.'
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит картинки постов в каталоги по хешу содержимого'
+        ' и обновляет Post.image пачками. Команду можно прерывать'
+        ' и запускать заново: перенесённые посты пропускаются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        storage = Post._meta.get_field('image').storage
+        posts = Post.objects.exclude(image='').exclude(
+            image__regex=SHARDED
+        ).order_by('pk')
+        last_pk = 0
+        moved = missing = 0
+        while True:
+            batch = list(
+                posts.filter(pk__gt=last_pk).values_list(
+                    'pk', 'image'
+                )[:options['batch_size']]
+            )
+            if not batch:
+                break
+            last_pk = batch[-1][0]
+            moves = {}
+            for name in {name for _, name in batch}:
+                if not storage.exists(name):
+                    missing += 1
+                    continue
+                # Файл копируется: старое имя продолжает работать,
+                # пока пост не обновлён; его затем удалит gc_media
+                with storage.open(name) as content:
+                    moves[name] = storage.save(name, content)
+            if not moves:
+                continue
+            with transaction.atomic():
+                moved += Post.objects.filter(
+                    pk__in=[pk for pk, _ in batch],
+                    image__in=list(moves)
+                ).update(
+                    image=Case(
+                        *[
+                            When(image=old, then=Value(new))
+                            for old, new in moves.items()
+                        ],
+                        default=F('image')
+                    ),
+                    # Новая метка изменения сбрасывает кэш карточек
+                    modified=Now()
+                )
+            caching.bump_feed_generation()
+            pagecache.purge_all()
+            self.stdout.write(f'Перенесено постов: {moved} (до pk {last_pk})')
+        self.stdout.write(
+            f'Готово. Перенесено постов: {moved},'
+            f' файлов не найдено: {missing}. Старые файлы удалит gc_media.'
+        )
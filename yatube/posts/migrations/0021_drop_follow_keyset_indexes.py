@@ -0,0 +1,21 @@
+# Generated by Django 2.2.16 on 2026-10-17 08:00
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0020_post_image_index'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='follow',
+            name='posts_follo_author__90742d_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='follow',
+            name='posts_follo_user_id_7ff3a6_idx',
+        ),
+    ]
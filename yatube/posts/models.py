@@ -2,6 +2,7 @@ from django.contrib.auth import get_user_model
 from django.db import models
 
 from core.models import CreatedModel
+from core.storage import ContentAddressedStorage
 
 
 User = get_user_model()
@@ -40,14 +41,31 @@ class Post(CreatedModel):
         verbose_name='Группа',
         help_text='Группа, к которой будет относиться пост'
     )
+    # Одинаковые картинки хранятся одним файлом (core.storage)
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=ContentAddressedStorage(),
         blank=True
     )
+    # Метка изменения входит в ключ кэша карточки поста (posts.caching)
+    modified = models.DateTimeField('Дата изменения', auto_now=True)
+    # Денормализованный счётчик, поддерживается сигналами (posts.counters)
+    comment_count = models.PositiveIntegerField(
+        'Число комментариев',
+        default=0,
+        editable=False
+    )
 
     class Meta:
         ordering = ('-pub_date',)
+        # id замыкает индексы: лента сортируется по (-pub_date, -id)
+        indexes = [
+            models.Index(fields=['author', '-pub_date', '-id']),
+            models.Index(fields=['group', '-pub_date', '-id']),
+            # gc_media ищет ссылки на файлы пачками image IN (...)
+            models.Index(fields=['image']),
+        ]
         verbose_name = 'Запись'
         verbose_name_plural = 'Записи'
 
@@ -76,6 +94,9 @@ class Comment(CreatedModel):
 
     class Meta:
         ordering = ('-pub_date',)
+        indexes = [
+            models.Index(fields=['post', '-pub_date']),
+        ]
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
 
@@ -99,5 +120,59 @@ class Follow(models.Model):
 
     class Meta:
         unique_together = ['user', 'author']
+        # Списки подписчиков и подписок листаются по (автор, id) и
+        # (пользователь, id) индексами внешних ключей: в SQLite индекс
+        # заканчивается rowid, и отдельные индексы ничего не добавляют
+        indexes = [
+            models.Index(fields=['author', 'user']),
+        ]
         verbose_name = 'Подписчик'
         verbose_name_plural = 'Подписчики'
+
+
+class FeedEntry(models.Model):
+    """Запись материализованной ленты подписок пользователя."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='читатель'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Запись'
+    )
+    # Копия Post.pub_date: лента сортируется без join с таблицей постов
+    pub_date = models.DateTimeField('Дата создания записи')
+
+    class Meta:
+        ordering = ('-pub_date',)
+        unique_together = ['user', 'post']
+        indexes = [
+            models.Index(fields=['user', '-pub_date', '-post']),
+        ]
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+
+
+class UserStats(models.Model):
+    """Денормализованные счётчики пользователя (см. posts.counters)."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Пользователь'
+    )
+    posts_count = models.PositiveIntegerField('Число постов', default=0)
+    followers_count = models.PositiveIntegerField(
+        'Число подписчиков',
+        default=0
+    )
+    following_count = models.PositiveIntegerField('Число подписок', default=0)
+
+    class Meta:
+        verbose_name = 'Счётчики пользователя'
+        verbose_name_plural = 'Счётчики пользователей'
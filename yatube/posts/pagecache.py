@@ -0,0 +1,149 @@
+"""
+Кэш целых страниц для анонимных читателей.
+
+Страница хранится по пути с query-строкой вместе с тегами объектов,
+которые на ней показаны (post:<pk>, author:<pk>, group:<pk>, а также
+index и profile:<pk> для лент целиком), и поколениями этих тегов на
+момент сохранения. Сигналы (posts.signals) увеличивают поколения
+тегов изменённых объектов, и страница с устаревшим поколением любого
+своего тега при чтении считается промахом. Остальные страницы кэша
+не затрагиваются.
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+
+from core.cache import (
+    acquire_lock, bump_generation, generation_key, get_generations,
+    release_lock
+)
+
+# Общий тег всех страниц: для массовых изменений вроде переноса картинок
+ALL = 'all'
+
+
+def page_key(request):
+    path = request.get_full_path()
+    return 'page:' + hashlib.md5(path.encode()).hexdigest()
+
+
+def tag_name(tag):
+    return f'page_tag:{tag}'
+
+
+def is_collecting(request):
+    """Собираются ли теги: только при промахе кэша для анонима."""
+    return getattr(request, 'page_cache_tags', None) is not None
+
+
+def add_tags(request, *tags):
+    if is_collecting(request):
+        request.page_cache_tags.update(tags)
+
+
+def post_tags(post):
+    tags = [f'post:{post.pk}', f'author:{post.author_id}']
+    if post.group_id:
+        tags.append(f'group:{post.group_id}')
+    return tags
+
+
+def add_post_tags(request, posts):
+    if is_collecting(request):
+        for post in posts:
+            add_tags(request, *post_tags(post))
+
+
+def purge(*tags):
+    """
+    Делает недействительными страницы с любым из тегов после фиксации
+    транзакции: страница, отрисованная до фиксации, иначе сохранилась
+    бы со старым содержимым под новыми поколениями тегов.
+    """
+    def bump():
+        for tag in set(tags):
+            bump_generation(tag_name(tag))
+    transaction.on_commit(bump)
+
+
+def purge_all():
+    purge(ALL)
+
+
+def is_current(entry):
+    """Не сменилось ли поколение ни одного тега страницы."""
+    current = cache.get_many(
+        [generation_key(tag_name(tag)) for tag in entry['tags']]
+    )
+    return all(
+        current.get(generation_key(tag_name(tag))) == generation
+        for tag, generation in entry['tags'].items()
+    )
+
+
+def make_response(entry):
+    return HttpResponse(entry['content'], content_type=entry['content_type'])
+
+
+def is_storable(request, response):
+    # Ответы с куками (например, CSRF) зависят от посетителя,
+    # а страница со старым фрагментом сама устарела
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        and not getattr(request, 'cache_served_stale', False)
+    )
+
+
+def store_page(key, request, response):
+    tags = {ALL, *request.page_cache_tags}
+    generations = get_generations([tag_name(tag) for tag in tags])
+    cache.set(
+        key,
+        {
+            'content': response.content,
+            'content_type': response['Content-Type'],
+            'tags': {tag: generations[tag_name(tag)] for tag in tags},
+        },
+        getattr(settings, 'PAGE_CACHE_TIMEOUT', 24 * 60 * 60)
+    )
+
+
+def cache_anonymous_page(view):
+    """
+    Отдаёт анонимам страницу из кэша, а при промахе сохраняет ответ
+    представления с тегами, собранными через add_tags. Устаревшую
+    страницу перерисовывает один запрос, остальные до конца
+    перерисовки получают прежнюю (core.cache.acquire_lock) и
+    помечают запрос как cache_served_stale.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if (
+            request.method not in ('GET', 'HEAD')
+            or request.user.is_authenticated
+        ):
+            return view(request, *args, **kwargs)
+        key = page_key(request)
+        entry = cache.get(key)
+        if entry is not None and is_current(entry):
+            return make_response(entry)
+        if not acquire_lock(key):
+            if entry is not None:
+                request.cache_served_stale = True
+                return make_response(entry)
+            return view(request, *args, **kwargs)
+        try:
+            request.page_cache_tags = set()
+            response = view(request, *args, **kwargs)
+            if is_storable(request, response):
+                store_page(key, request, response)
+            return response
+        finally:
+            release_lock(key)
+    return wrapper
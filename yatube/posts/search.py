@@ -0,0 +1,177 @@
+"""
+Полнотекстовый поиск по постам.
+
+На SQLite используется FTS5: таблица posts_post_fts индексирует
+posts_post.text (external content) и поддерживается триггерами,
+результаты ранжируются по bm25, фрагменты с подсветкой строит snippet().
+На других СУБД поиск сводится к icontains без ранжирования.
+
+SQLite пересоздаёт таблицу при части ALTER TABLE, и триггеры при этом
+теряются: после таких миграций нужна команда rebuild_search_index.
+"""
+import re
+from contextlib import contextmanager
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Post
+
+FTS_TABLE = 'posts_post_fts'
+CREATE_SQL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    "text, content='posts_post', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert "
+    "AFTER INSERT ON posts_post BEGIN "
+    f"INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text); "
+    "END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete "
+    "AFTER DELETE ON posts_post BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text) "
+    "VALUES ('delete', old.id, old.text); "
+    "END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update "
+    "AFTER UPDATE OF text ON posts_post BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text) "
+    "VALUES ('delete', old.id, old.text); "
+    f"INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text); "
+    "END",
+]
+REBUILD_SQL = f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"
+TRIGGERS = [
+    f'{FTS_TABLE}_insert', f'{FTS_TABLE}_delete', f'{FTS_TABLE}_update'
+]
+
+# Управляющие символы не встречаются в тексте постов, поэтому
+# фрагмент можно экранировать целиком и лишь затем вставить <mark>
+HIGHLIGHT_START = '\x02'
+HIGHLIGHT_END = '\x03'
+SNIPPET_TOKENS = 24
+
+
+def is_supported():
+    return connection.vendor == 'sqlite'
+
+
+def rebuild_index():
+    """Создаёт недостающие таблицу и триггеры и переиндексирует посты."""
+    with connection.cursor() as cursor:
+        for sql in CREATE_SQL + [REBUILD_SQL]:
+            cursor.execute(sql)
+
+
+@contextmanager
+def suspended_index():
+    """
+    Снимает триггеры индекса на время массовой загрузки постов и
+    переиндексирует их одним rebuild_index в конце: построчное
+    обновление FTS5 на миллионах вставок намного медленнее.
+    """
+    if not is_supported():
+        yield
+        return
+    with connection.cursor() as cursor:
+        for trigger in TRIGGERS:
+            cursor.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+    try:
+        yield
+    finally:
+        rebuild_index()
+
+
+def build_match(query):
+    """
+    Превращает строку пользователя в выражение MATCH: каждое слово
+    берётся в кавычки (операторы FTS5 не интерпретируются), все слова
+    обязательны, последнее ищется по префиксу.
+    """
+    words = re.findall(r'\w+', query)
+    if not words:
+        return ''
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def highlight(snippet):
+    return mark_safe(
+        escape(snippet)
+        .replace(HIGHLIGHT_START, '<mark>')
+        .replace(HIGHLIGHT_END, '</mark>')
+    )
+
+
+def matching_ids(query):
+    """Подзапрос с pk найденных постов, для фильтра pk__in."""
+    return RawSQL(
+        f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+        [build_match(query)]
+    )
+
+
+class SearchResults:
+    """
+    Ленивые результаты поиска для Paginator: число совпадений и срез
+    страницы — отдельные запросы к FTS5 (срез упорядочен по bm25),
+    посты страницы догружаются одним запросом с select_related.
+    У постов появляются атрибуты rank и snippet.
+    """
+
+    def __init__(self, query):
+        self.match = build_match(query)
+
+    def count(self):
+        if not self.match:
+            return 0
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT count(*) FROM {FTS_TABLE} '
+                f'WHERE {FTS_TABLE} MATCH %s',
+                [self.match]
+            )
+            return cursor.fetchone()[0]
+
+    def __getitem__(self, key):
+        if not self.match:
+            return []
+        offset = key.start or 0
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid, rank, snippet({FTS_TABLE}, 0, %s, %s, '
+                f"'…', %s) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s "
+                'ORDER BY rank, rowid DESC LIMIT %s OFFSET %s',
+                [
+                    HIGHLIGHT_START,
+                    HIGHLIGHT_END,
+                    SNIPPET_TOKENS,
+                    self.match,
+                    key.stop - offset,
+                    offset,
+                ]
+            )
+            rows = cursor.fetchall()
+        posts = Post.objects.select_related('author', 'group').in_bulk(
+            [rowid for rowid, _, _ in rows]
+        )
+        results = []
+        for rowid, rank, snippet in rows:
+            post = posts.get(rowid)
+            if post is not None:
+                post.rank = rank
+                post.snippet = highlight(snippet)
+                results.append(post)
+        return results
+
+
+def search_posts(query):
+    """Найденные посты: SearchResults или QuerySet без FTS5."""
+    if is_supported():
+        return SearchResults(query)
+    if not query:
+        return Post.objects.none()
+    return Post.objects.select_related('author', 'group').filter(
+        text__icontains=query
+    )
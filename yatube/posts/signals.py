@@ -0,0 +1,164 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import caching, counters, feed, follow_graph, pagecache
+from .models import Comment, Follow, Group, Post, UserStats
+from .thumbnails import thumbnails_ready
+
+User = get_user_model()
+
+
+# Счётчики подключаются раньше ленты: стратегия ленты опирается
+# на актуальное число подписчиков автора.
+@receiver(post_save, sender=User)
+def create_user_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=Post)
+def count_created_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.increment_user_stat(instance.author_id, 'posts_count')
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    counters.decrement_user_stat(instance.author_id, 'posts_count')
+
+
+@receiver(post_save, sender=Comment)
+def count_created_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.increment_comment_count(instance.post_id)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    counters.decrement_comment_count(instance.post_id)
+
+
+@receiver(post_save, sender=Follow)
+def count_created_follow(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.increment_user_stat(instance.author_id, 'followers_count')
+        counters.increment_user_stat(instance.user_id, 'following_count')
+
+
+@receiver(post_delete, sender=Follow)
+def count_deleted_follow(sender, instance, **kwargs):
+    counters.decrement_user_stat(instance.author_id, 'followers_count')
+    counters.decrement_user_stat(instance.user_id, 'following_count')
+
+
+@receiver(post_save, sender=Post)
+def push_post_to_feeds(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        feed.push_post(instance)
+
+
+@receiver(post_save, sender=Follow)
+def fill_feed_on_follow(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        feed.add_author(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def clear_feed_on_unfollow(sender, instance, **kwargs):
+    feed.remove_author(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_feed_cache(sender, raw=False, **kwargs):
+    if not raw:
+        caching.bump_feed_generation()
+
+
+# Граф увеличивает поколения подписок, от которых зависят
+# кэш ленты подписок и ETag страниц пользователя
+@receiver(post_save, sender=Follow)
+def index_created_follow(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        follow_graph.graph.add(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def index_deleted_follow(sender, instance, **kwargs):
+    follow_graph.graph.remove(instance.user_id, instance.author_id)
+
+
+@receiver(thumbnails_ready)
+def invalidate_thumbnail_placeholders(sender, post, **kwargs):
+    # Карточка и фрагменты лент могли сохранить заглушку вместо миниатюры
+    caching.invalidate_post_card(post)
+    caching.bump_feed_generation()
+    pagecache.purge(f'post:{post.pk}')
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def purge_post_pages(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    tags = pagecache.post_tags(instance)
+    if kwargs.get('created', True):
+        # Новый или удалённый пост сдвигает страницы всех его лент
+        tags.append('index')
+    pagecache.purge(*tags)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def purge_comment_pages(sender, instance, raw=False, **kwargs):
+    if not raw:
+        pagecache.purge(f'post:{instance.post_id}')
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def purge_group_pages(sender, instance, raw=False, **kwargs):
+    if not raw:
+        pagecache.purge(f'group:{instance.pk}')
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def purge_follow_pages(sender, instance, raw=False, **kwargs):
+    # Счётчики подписок показывает только профиль
+    if not raw:
+        pagecache.purge(
+            f'profile:{instance.author_id}', f'profile:{instance.user_id}'
+        )
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group_cards(sender, instance, raw=False, **kwargs):
+    if not raw:
+        caching.bump_group_cards(instance.pk)
+
+
+@receiver(post_save, sender=User)
+def invalidate_author_cards(sender, instance, created, raw=False,
+                            update_fields=None, **kwargs):
+    # У нового пользователя карточек нет, вход меняет только last_login
+    if raw or created or update_fields == frozenset({'last_login'}):
+        return
+    caching.bump_author_cards(instance.pk)
+    # Фрагменты лент тоже содержат имя автора
+    caching.bump_feed_generation()
+
+
+@receiver(post_save, sender=User)
+def purge_user_pages(sender, instance, raw=False, update_fields=None,
+                     **kwargs):
+    # Вход пользователя обновляет только last_login
+    if raw or update_fields == frozenset({'last_login'}):
+        return
+    pagecache.purge(f'author:{instance.pk}')
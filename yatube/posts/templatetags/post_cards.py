@@ -0,0 +1,34 @@
+from django import template
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from posts.caching import get_post_cards
+from posts.follow_graph import graph
+
+FOLLOWING_BADGE_TEMPLATE = 'posts/includes/following_badge.html'
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_cards(posts, viewer=None):
+    """
+    Карточки постов страницы из кэша: {% post_cards page_obj as cards %}.
+    С зрителем ({% post_cards page_obj user as cards %}) карточки
+    авторов, на которых он подписан, получают значок. Сами карточки
+    в кэше общие, значок добавляется поверх.
+    """
+    posts = list(posts)
+    cards = get_post_cards(posts)
+    if viewer is None or not viewer.is_authenticated:
+        return cards
+    following = graph.following_among(
+        viewer.pk, {post.author_id for post in posts}
+    )
+    if not following:
+        return cards
+    badge = render_to_string(FOLLOWING_BADGE_TEMPLATE)
+    return [
+        mark_safe(badge + card) if post.author_id in following else card
+        for post, card in zip(posts, cards)
+    ]
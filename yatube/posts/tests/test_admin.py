@@ -0,0 +1,105 @@
+import re
+
+from django.contrib import admin
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.urls import reverse
+
+from core.testing import QueryBudget
+
+from ..models import Comment, Follow, Group, Post, User
+
+PAGE_SIZES = (10, 100)
+
+
+class AdminChangeListTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass'
+        )
+        groups = [
+            Group.objects.create(
+                title=f'Группа {n}', slug=f'group_{n}', description='-'
+            )
+            for n in range(5)
+        ]
+        authors = [
+            User.objects.create_user(username=f'author_{n}')
+            for n in range(5)
+        ]
+        for author in authors:
+            Follow.objects.create(user=cls.admin, author=author)
+        posts = [
+            Post.objects.create(
+                text=f'Пост {n}',
+                author=authors[n % len(authors)],
+                group=groups[n % len(groups)]
+            )
+            for n in range(110)
+        ]
+        for n, post in enumerate(posts):
+            Comment.objects.create(
+                post=post, author=cls.admin, text=f'Комментарий {n}'
+            )
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def changelist(self, model, **params):
+        return self.client.get(
+            reverse(f'admin:posts_{model}_changelist'), params
+        )
+
+    def test_changelists_fit_query_budget(self):
+        """Число запросов не зависит от числа строк на странице."""
+        # Сессия, пользователь, строки, страница и оценка числа строк
+        budgets = {'post': 7, 'comment': 6, 'follow': 6}
+        for model, max_queries in budgets.items():
+            model_admin = admin.site._registry[
+                {'post': Post, 'comment': Comment, 'follow': Follow}[model]
+            ]
+            for per_page in PAGE_SIZES:
+                with self.subTest(model=model, per_page=per_page):
+                    model_admin.list_per_page = per_page
+                    try:
+                        with QueryBudget(max_queries):
+                            response = self.changelist(model)
+                    finally:
+                        del model_admin.list_per_page
+                    self.assertEqual(response.status_code, 200)
+
+    def test_changelist_does_not_count_whole_table(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.changelist('post')
+        self.assertFalse([
+            query['sql'] for query in queries
+            if re.match(r'SELECT COUNT\(\*\) AS "__count" FROM "posts_post"',
+                        query['sql'])
+        ])
+        self.assertContains(response, 'примерно')
+
+    def test_cursor_pages_follow_each_other(self):
+        first = self.changelist('post')
+        first_page = list(first.context['cl'].result_list)
+        self.assertEqual(first_page[0], Post.objects.order_by('-pk')[0])
+        self.assertIsNone(first.context['cl'].previous_url)
+        second = self.client.get(
+            reverse('admin:posts_post_changelist')
+            + first.context['cl'].next_url
+        )
+        second_page = list(second.context['cl'].result_list)
+        self.assertEqual(len(second_page), 10)
+        self.assertLess(second_page[0].pk, first_page[-1].pk)
+        back = self.client.get(
+            reverse('admin:posts_post_changelist')
+            + second.context['cl'].previous_url
+        )
+        self.assertEqual(list(back.context['cl'].result_list), first_page)
+
+    def test_sorting_falls_back_to_numbered_pages(self):
+        response = self.changelist('post', o='3', p='1')
+        self.assertFalse(response.context['cl'].cursor_mode)
+        self.assertEqual(len(response.context['cl'].result_list), 10)
@@ -0,0 +1,197 @@
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.http import HttpRequest
+from django.template import Context, Template
+from django.test import SimpleTestCase
+
+from core.cache import acquire_lock, get_or_compute, release_lock
+from core.sqlite_cache import SQLiteCache, _local_layers
+
+INCREMENT_SCRIPT = (
+    'import sys\n'
+    'from core.sqlite_cache import SQLiteCache\n'
+    "cache = SQLiteCache(sys.argv[1], {'OPTIONS': {'L1_TIMEOUT': 0}})\n"
+    'for _ in range(200):\n'
+    "    cache.incr('counter')\n"
+)
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.location = os.path.join(self.directory, 'cache.sqlite3')
+        self.cache = self.make_cache()
+
+    def tearDown(self):
+        _local_layers.pop(self.location, None)
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def make_cache(self, **options):
+        options.setdefault('L1_TIMEOUT', 0)
+        return SQLiteCache(self.location, {'OPTIONS': options})
+
+    def test_values_round_trip(self):
+        values = {'int': 5, 'big': 2 ** 70, 'text': 'текст', 'list': [1, 2]}
+        self.cache.set_many(values)
+        self.assertEqual(self.cache.get_many([*values, 'missing']), values)
+        self.cache.delete_many(['int', 'text'])
+        self.assertEqual(self.cache.get_many(values), {
+            'big': 2 ** 70, 'list': [1, 2]
+        })
+
+    def test_expired_entries_are_missing_and_replaceable(self):
+        self.cache.set('key', 'old', timeout=0)
+        self.assertIsNone(self.cache.get('key'))
+        self.assertTrue(self.cache.add('key', 'new'))
+        self.assertFalse(self.cache.add('key', 'newer'))
+        self.assertEqual(self.cache.get('key'), 'new')
+        self.assertTrue(self.cache.touch('key', timeout=0))
+        self.assertFalse(self.cache.has_key('key'))
+
+    def test_incr(self):
+        self.cache.set('number', 1)
+        self.assertEqual(self.cache.incr('number', 5), 6)
+        self.assertEqual(self.cache.decr('number'), 5)
+        self.cache.set('float', 1.5)
+        self.assertEqual(self.cache.incr('float'), 2.5)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_incr_is_atomic_across_processes(self):
+        self.cache.set('counter', 0)
+        workers = [
+            subprocess.Popen(
+                [sys.executable, '-c', INCREMENT_SCRIPT, self.location],
+                cwd=settings.BASE_DIR
+            )
+            for _ in range(2)
+        ]
+        for worker in workers:
+            self.assertEqual(worker.wait(timeout=60), 0)
+        self.assertEqual(self.cache.get('counter'), 400)
+
+    def test_cull_evicts_least_recently_read(self):
+        cache = self.make_cache(
+            MAX_ENTRIES=10, CULL_FREQUENCY=2, CULL_CHECK_INTERVAL=1000
+        )
+        with mock.patch('core.sqlite_cache.ACCESS_GRANULARITY', -1):
+            for number in range(10):
+                cache.set(f'key_{number}', number)
+            cache.get_many([f'key_{number}' for number in range(5)])
+        cache.cull()
+        self.assertEqual(
+            sorted(cache.get_many(f'key_{number}' for number in range(10))),
+            [f'key_{number}' for number in range(5)]
+        )
+
+    def test_local_layer_sees_other_processes_after_timeout(self):
+        # L1 общий на файл и создан в setUp выключенным
+        _local_layers.pop(self.location)
+        cache = self.make_cache(L1_TIMEOUT=0.05)
+        cache.set('generation', 1)
+        # Запись другого процесса мимо L1 этого
+        with sqlite3.connect(self.location) as connection:
+            connection.execute(
+                "UPDATE cache SET value = 2 WHERE key = ':1:generation'"
+            )
+        self.assertEqual(cache.get('generation'), 1)
+        time.sleep(0.1)
+        self.assertEqual(cache.get('generation'), 2)
+
+
+class GetOrComputeTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+
+    def compute(self, value='value'):
+        def compute():
+            self.calls += 1
+            return value
+        return compute
+
+    def test_only_one_of_concurrent_misses_computes(self):
+        def slow():
+            time.sleep(0.2)
+            return self.compute()()
+
+        with ThreadPoolExecutor(8) as executor:
+            results = list(executor.map(
+                lambda _: get_or_compute('key', slow, 60), range(8)
+            ))
+        self.assertEqual(results, ['value'] * 8)
+        self.assertEqual(self.calls, 1)
+
+    def test_stale_value_served_while_other_recomputes(self):
+        get_or_compute('key', self.compute('old'), 60, version=1)
+        stale = mock.Mock()
+        acquire_lock('key')
+        try:
+            value = get_or_compute(
+                'key', self.compute('new'), 60, version=2, on_stale=stale
+            )
+        finally:
+            release_lock('key')
+        self.assertEqual(value, 'old')
+        stale.assert_called_once_with()
+        self.assertEqual(
+            get_or_compute('key', self.compute('new'), 60, version=2), 'new'
+        )
+
+    def test_expired_value_is_recomputed(self):
+        get_or_compute('key', self.compute('old'), 0, stale_timeout=60)
+        self.assertEqual(get_or_compute('key', self.compute('new'), 0), 'new')
+
+    def test_early_refresh_is_probabilistic(self):
+        get_or_compute('key', self.compute('old'), 60)
+        # Долгий пересчёт и случайное число около единицы
+        # сдвигают срок далеко вперёд
+        with mock.patch('core.cache.random.random', return_value=1 - 1e-15):
+            cache.set('key', ('old', None, time.time() + 60, 100), 120)
+            value = get_or_compute('key', self.compute('new'), 60)
+        self.assertEqual(value, 'new')
+        with mock.patch('core.cache.random.random', return_value=0.5):
+            value = get_or_compute('key', self.compute('newer'), 60)
+        self.assertEqual(value, 'new')
+
+    @mock.patch('core.cache.WAIT_TIMEOUT', 0.1)
+    def test_cold_miss_computes_after_waiting(self):
+        acquire_lock('key')
+        try:
+            value = get_or_compute('key', self.compute(), 60)
+        finally:
+            release_lock('key')
+        self.assertEqual(value, 'value')
+
+    def test_template_tag(self):
+        fragment = Template(
+            '{% load stampede_cache %}'
+            '{% stampede_cache 60 fragment page version=version %}'
+            '{{ text }}{% endstampede_cache %}'
+        )
+        request = HttpRequest()
+
+        def render(text, version):
+            return fragment.render(Context({
+                'text': text, 'page': 1, 'version': version,
+                'request': request,
+            }))
+
+        self.assertEqual(render('old', 1), 'old')
+        self.assertEqual(render('new', 1), 'old')
+        acquire_lock(make_template_fragment_key('fragment', [1]))
+        self.assertEqual(render('new', 2), 'old')
+        self.assertTrue(request.cache_served_stale)
+        release_lock(make_template_fragment_key('fragment', [1]))
+        self.assertEqual(render('new', 2), 'new')
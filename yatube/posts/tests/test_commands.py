@@ -0,0 +1,293 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+
+from ..caching import post_card_key
+from ..models import Comment, FeedEntry, Follow, Post, User, UserStats
+from ..search import search_posts
+from ..variants import WIDTHS, read_manifest
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+class ReconcileCountersCommandTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+        Comment.objects.create(
+            post=cls.post,
+            author=cls.reader,
+            text='Комментарий'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def test_command_fixes_drifted_counters(self):
+        """Команда reconcile_counters исправляет расхождения."""
+        UserStats.objects.update(
+            posts_count=7,
+            followers_count=7,
+            following_count=7
+        )
+        UserStats.objects.filter(user=self.reader).delete()
+        Post.objects.update(comment_count=0)
+        call_command('reconcile_counters', batch_size=1, stdout=StringIO())
+        author_stats = UserStats.objects.get(user=self.author)
+        reader_stats = UserStats.objects.get(user=self.reader)
+        self.assertEqual(author_stats.posts_count, 1)
+        self.assertEqual(author_stats.followers_count, 1)
+        self.assertEqual(author_stats.following_count, 0)
+        self.assertEqual(reader_stats.following_count, 1)
+        self.assertEqual(Post.objects.get().comment_count, 1)
+
+
+class CheckQueryPlansCommandTest(TestCase):
+    def test_feed_queries_use_indexes(self):
+        """
+        Запросы лент не сканируют таблицы целиком
+        и не сортируют во временных B-деревьях.
+        """
+        call_command('check_query_plans', stdout=StringIO())
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class SeedYatubeCommandTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_command_creates_consistent_dataset(self):
+        """seed_yatube создаёт данные, счётчики и ленты согласованы."""
+        output = StringIO()
+        call_command(
+            'seed_yatube',
+            users=10,
+            groups=3,
+            posts=200,
+            comments=50,
+            follows=20,
+            image_ratio=0.5,
+            batch_size=30,
+            stdout=output
+        )
+        # Вывод вложенной reconcile_counters идёт туда же
+        self.assertIn('Пересчитано', output.getvalue())
+        self.assertEqual(User.objects.count(), 10)
+        self.assertEqual(Post.objects.count(), 200)
+        self.assertEqual(Comment.objects.count(), 50)
+        self.assertEqual(Follow.objects.count(), 20)
+        # Даты постов распределены по периоду, а не равны времени запуска
+        self.assertGreater(
+            Post.objects.values('pub_date').distinct().count(), 1
+        )
+        author = UserStats.objects.order_by('-posts_count').first()
+        self.assertEqual(
+            author.posts_count,
+            Post.objects.filter(author_id=author.user_id).count()
+        )
+        follow = Follow.objects.first()
+        self.assertTrue(
+            FeedEntry.objects.filter(
+                user_id=follow.user_id,
+                post__author_id=follow.author_id
+            ).exists()
+            or not Post.objects.filter(author_id=follow.author_id).exists()
+        )
+        # Картинки лежат в хранилище поля под именами из хеша
+        image = Post.objects.exclude(image='').first().image
+        self.assertRegex(image.name, r'^posts/\w\w/\w\w/\w{64}\.jpg$')
+        self.assertTrue(image.storage.exists(image.name))
+        # Индекс поиска перестроен, триггеры возвращены
+        word = Post.objects.first().text.split()[0].strip('.,')
+        self.assertGreater(search_posts(word).count(), 0)
+        Post.objects.create(author_id=author.user_id, text='Уникальное')
+        self.assertEqual(search_posts('Уникальное').count(), 1)
+
+
+class BenchViewsCommandTest(TestCase):
+    def setUp(self):
+        call_command(
+            'seed_yatube',
+            users=5,
+            groups=2,
+            posts=30,
+            comments=10,
+            follows=5,
+            skip_feeds=True,
+            stdout=StringIO()
+        )
+        self.output = os.path.join(tempfile.mkdtemp(), 'bench.json')
+
+    def test_command_saves_results(self):
+        """bench_views сохраняет перцентили, запросы и объём ответа."""
+        call_command(
+            'bench_views',
+            requests=3,
+            warmup=0,
+            output=self.output,
+            stdout=StringIO()
+        )
+        with open(self.output) as output:
+            results = json.load(output)['current']
+        self.assertIn('post_create', results)
+        for stats in results.values():
+            self.assertLessEqual(stats['p50_ms'], stats['p99_ms'])
+        self.assertGreater(results['post_detail']['queries'], 0)
+        self.assertGreater(results['index']['bytes'], 0)
+        # Замер не оставляет в базе своего пользователя и его записей
+        self.assertFalse(User.objects.filter(username='bench_user').exists())
+        self.assertFalse(
+            Post.objects.filter(author__username='bench_user').exists()
+        )
+        self.assertFalse(
+            Follow.objects.filter(user__username='bench_user').exists()
+        )
+
+    def test_cold_run_keeps_shared_cache(self):
+        """--cold очищает только отдельный кэш замера."""
+        cache.set('bench_marker', 1)
+        call_command(
+            'bench_views',
+            requests=1,
+            warmup=0,
+            cold=True,
+            skip_writes=True,
+            stdout=StringIO()
+        )
+        self.assertEqual(cache.get('bench_marker'), 1)
+
+    def test_command_fails_on_regression(self):
+        """bench_views падает, если результат хуже базового."""
+        with open(self.output, 'w') as baseline:
+            json.dump(
+                {'current': {'index': {'p95_ms': 0.0, 'queries': 0}}},
+                baseline
+            )
+        with self.assertRaisesMessage(CommandError, 'current/index'):
+            call_command(
+                'bench_views',
+                requests=1,
+                warmup=0,
+                skip_writes=True,
+                baseline=self.output,
+                stdout=StringIO()
+            )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, VARIANT_WORKERS=0)
+class BuildVariantsCommandTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        author = User.objects.create_user(username='author')
+        self.post = Post.objects.create(
+            author=author,
+            text='Пост',
+            image=SimpleUploadedFile(
+                name='small.gif',
+                content=(
+                    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+                    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+                    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+                    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+                    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+                    b'\x0A\x00\x3B'
+                ),
+                content_type='image/gif'
+            )
+        )
+
+    def test_command_builds_variants_in_process_pool(self):
+        """build_variants строит варианты всех ширин в пуле процессов."""
+        output = StringIO()
+        call_command('build_variants', workers=1, stdout=output)
+        self.assertIn('Построено вариантов: 1', output.getvalue())
+        manifest = read_manifest(self.post.image.name)
+        self.assertEqual(
+            [width for width, _ in manifest['image/jpeg']], list(WIDTHS)
+        )
+        # Повторный запуск пропускает готовые картинки
+        output = StringIO()
+        call_command('build_variants', workers=0, stdout=output)
+        self.assertIn('Построено вариантов: 0', output.getvalue())
+
+    def test_command_drops_cards_without_deferred_loads(self):
+        """Карточки пачки сбрасываются без дозагрузки полей поста."""
+        key = post_card_key(self.post)
+        cache.set(key, 'card')
+        # Имена картинок и посты пачки
+        with self.assertNumQueries(2):
+            call_command(
+                'build_variants', workers=0, force=True, stdout=StringIO()
+            )
+        self.assertIsNone(cache.get(key))
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, VARIANT_WORKERS=0)
+class GcMediaCommandTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_command_removes_only_unreferenced_images(self):
+        """gc_media удаляет картинки, на которые не ссылаются посты."""
+        author = User.objects.create_user(username='author')
+        kept, removed = [
+            Post.objects.create(
+                author=author,
+                text='Пост',
+                image=SimpleUploadedFile(name='image.jpg', content=content)
+            )
+            for content in (b'kept', b'removed')
+        ]
+        storage = removed.image.storage
+        removed_name = removed.image.name
+        removed.delete()
+        output = StringIO()
+        call_command('gc_media', grace=0, dry_run=True, stdout=output)
+        self.assertIn(removed_name, output.getvalue())
+        self.assertTrue(storage.exists(removed_name))
+        call_command('gc_media', grace=0, stdout=StringIO())
+        self.assertFalse(storage.exists(removed_name))
+        self.assertTrue(storage.exists(kept.image.name))
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ShardMediaCommandTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_command_moves_flat_images_to_shards(self):
+        """shard_media раскладывает старые картинки по каталогам хеша."""
+        author = User.objects.create_user(username='author')
+        name = default_storage.save('posts/legacy.jpg', ContentFile(b'old'))
+        post = Post.objects.create(author=author, text='Пост', image=name)
+        call_command('shard_media', batch_size=1, stdout=StringIO())
+        post.refresh_from_db()
+        self.assertRegex(post.image.name, r'^posts/\w\w/\w\w/\w{64}\.jpg$')
+        self.assertTrue(post.image.storage.exists(post.image.name))
+        # Старый файл остаётся до gc_media, повторный запуск ничего не делает
+        self.assertTrue(default_storage.exists(name))
+        output = StringIO()
+        call_command('shard_media', stdout=output)
+        self.assertIn('Перенесено постов: 0', output.getvalue())
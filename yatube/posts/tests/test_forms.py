@@ -1,10 +1,14 @@
+import hashlib
+import os
 import shutil
 import tempfile
+from io import BytesIO
 
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
 
 from ..models import Comment, Group, Post, User
 
@@ -17,7 +21,7 @@ TEST_CACHE_SETTING = {
 }
 
 
-@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, VARIANT_WORKERS=0)
 class PostCreateFormTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -77,7 +81,13 @@ class PostCreateFormTests(TestCase):
         self.assertEqual(post.author, self.user)
         self.assertEqual(post.text, 'Тестовый текст')
         self.assertEqual(post.group, self.group)
-        self.assertEqual(post.image.name, f'posts/{form_data["image"].name}')
+        # Картинка названа по хешу содержимого и лежит в каталогах
+        # из его первых символов (core.storage)
+        digest = hashlib.sha256(uploaded.file.getvalue()).hexdigest()
+        self.assertEqual(
+            post.image.name,
+            f'posts/{digest[:2]}/{digest[2:4]}/{digest}.gif'
+        )
 
         username = self.user.username
         self.assertRedirects(
@@ -86,6 +96,63 @@ class PostCreateFormTests(TestCase):
             )
         )
 
+    def test_same_image_is_stored_once(self):
+        """Одинаковые картинки разных постов хранятся одним файлом."""
+        for text in ('Первый', 'Второй'):
+            self.authorized_client.post(
+                reverse('posts:post_create'),
+                data={
+                    'text': text,
+                    'image': SimpleUploadedFile(
+                        name=f'{text}.gif',
+                        content=(
+                            b'\x47\x49\x46\x38\x39\x61\x01\x00'
+                            b'\x01\x00\x80\x00\x00\x00\x00\x00'
+                            b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+                            b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+                            b'\x01\x00\x01\x00\x00\x02\x02\x0C'
+                            b'\x0A\x00\x3B'
+                        ),
+                        content_type='image/gif'
+                    ),
+                }
+            )
+        first, second = Post.objects.all()
+        self.assertEqual(first.image.name, second.image.name)
+        # Временные файлы записи переименованы, а не оставлены рядом
+        _, files = first.image.storage.listdir(
+            os.path.dirname(first.image.name)
+        )
+        self.assertFalse([name for name in files if name.startswith('.')])
+
+    @override_settings(POST_IMAGE_MAX_SIZE=100)
+    def test_large_image_is_downscaled_and_stripped(self):
+        """Крупная картинка уменьшается и сохраняется без метаданных."""
+        exif = Image.Exif()
+        exif[0x010F] = 'Camera'
+        buffer = BytesIO()
+        Image.new('RGB', (300, 150), 'red').save(
+            buffer, 'JPEG', exif=exif.tobytes()
+        )
+        uploaded = SimpleUploadedFile(
+            name='photo.jpeg',
+            content=buffer.getvalue(),
+            content_type='image/jpeg'
+        )
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Фото', 'image': uploaded},
+            follow=True
+        )
+        post = Post.objects.get()
+        self.assertRegex(
+            post.image.name,
+            r'^posts/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.jpg$'
+        )
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.size, (100, 50))
+            self.assertNotIn('exif', image.info)
+
     def test_edit_post(self):
         """Валидная форма изменяет запись в Post."""
         post = Post.objects.create(
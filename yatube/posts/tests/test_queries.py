@@ -0,0 +1,83 @@
+from unittest import mock
+
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.testing import QueryBudget
+
+from ..models import Comment, Follow, Group, Post, User
+
+TEST_CACHE_SETTING = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+    }
+}
+PAGE_SIZES = (10, 100)
+
+
+@override_settings(CACHES=TEST_CACHE_SETTING)
+class QueryBudgetTests(TestCase):
+    """
+    Число запросов страниц не зависит от размера страницы.
+    Кеш отключён, чтобы мерить худший случай.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='test_group',
+            description='test_group_description',
+            slug='test_slug'
+        )
+        authors = [
+            User.objects.create_user(username=f'author_{n}')
+            for n in range(5)
+        ]
+        for author in authors:
+            Follow.objects.create(user=cls.reader, author=author)
+        for n in range(110):
+            cls.post = Post.objects.create(
+                text=f'Тестовый текст {n}',
+                author=authors[n % len(authors)],
+                group=cls.group
+            )
+        for n in range(110):
+            Comment.objects.create(
+                post=cls.post,
+                author=authors[n % len(authors)],
+                text=f'Комментарий {n}'
+            )
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+
+    def test_pages_fit_query_budget(self):
+        """Страницы укладываются в бюджет запросов при 10 и 100 постах."""
+        # Сессия и пользователь занимают два запроса в каждом бюджете,
+        # подписки читателя для значков на карточках — ещё один
+        budgets = {
+            reverse('posts:index'): 4,
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}): 5,
+            reverse(
+                'posts:profile', kwargs={'username': self.post.author}
+            ): 5,
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}): 4,
+            reverse('posts:follow_index'): 4,
+            reverse(
+                'posts:following', kwargs={'username': self.reader}
+            ): 4,
+            reverse(
+                'posts:followers', kwargs={'username': self.post.author}
+            ): 4,
+        }
+        for per_page in PAGE_SIZES:
+            for url, max_queries in budgets.items():
+                with self.subTest(url=url, per_page=per_page), mock.patch(
+                    'posts.views.NUMBER_OF_POSTS_DISPLAYED', per_page
+                ):
+                    with QueryBudget(max_queries):
+                        response = self.authorized_client.get(url)
+                    self.assertEqual(response.status_code, 200)
@@ -0,0 +1,102 @@
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.signals import request_finished, request_started
+from django.test import Client, RequestFactory, TestCase
+from django.urls import reverse
+
+from core.sessions import SessionStore
+from users.auth import get_user
+
+User = get_user_model()
+
+
+class CachedSessionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_write_is_deferred_until_request_finished(self):
+        store = SessionStore()
+        store['answer'] = 1
+        store.create()
+        request_started.send(sender=self.__class__)
+        store['answer'] = 42
+        store.save()
+        self.assertEqual(SessionStore(store.session_key)['answer'], 42)
+        row = Session.objects.get(session_key=store.session_key)
+        self.assertEqual(store.decode(row.session_data)['answer'], 1)
+        request_finished.send(sender=self.__class__)
+        row = Session.objects.get(session_key=store.session_key)
+        self.assertEqual(store.decode(row.session_data)['answer'], 42)
+
+    def test_deleted_session_is_not_persisted(self):
+        store = SessionStore()
+        store.create()
+        session_key = store.session_key
+        request_started.send(sender=self.__class__)
+        store['answer'] = 42
+        store.save()
+        store.delete()
+        request_finished.send(sender=self.__class__)
+        self.assertFalse(
+            Session.objects.filter(session_key=session_key).exists()
+        )
+
+    def test_save_outside_request_writes_immediately(self):
+        store = SessionStore()
+        store.create()
+        store['answer'] = 42
+        store.save()
+        row = Session.objects.get(session_key=store.session_key)
+        self.assertEqual(store.decode(row.session_data)['answer'], 42)
+
+
+class CachedUserTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(
+            username='reader', email='reader@example.com', password='secret'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.login(username='reader', password='secret')
+
+    def make_request(self):
+        request = RequestFactory().get('/')
+        request.session = SessionStore(self.client.session.session_key)
+        return request
+
+    def test_warm_request_skips_session_and_user_queries(self):
+        url = reverse('about:author')
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response.context['user'].username, 'reader')
+
+    def test_user_fields_outside_snapshot_load_lazily(self):
+        get_user(self.make_request())
+        with self.assertNumQueries(0):
+            user = get_user(self.make_request())
+            self.assertEqual(user.pk, self.user.pk)
+            self.assertTrue(user.is_authenticated)
+        with self.assertNumQueries(1):
+            self.assertEqual(user.email, 'reader@example.com')
+
+    def test_password_change_logs_out_other_sessions(self):
+        get_user(self.make_request())
+        user = User.objects.get(pk=self.user.pk)
+        user.set_password('changed')
+        user.save()
+        self.assertFalse(get_user(self.make_request()).is_authenticated)
+
+    def test_stale_session_hash_flushes_session(self):
+        get_user(self.make_request())
+        request = self.make_request()
+        cached = cache.get(f'user:{self.user.pk}')
+        cached['session_hash'] = 'other'
+        cache.set(f'user:{self.user.pk}', cached)
+        self.assertFalse(get_user(request).is_authenticated)
+        self.assertIsNone(request.session.session_key)
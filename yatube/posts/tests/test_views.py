@@ -1,20 +1,36 @@
 import shutil
 import tempfile
+from unittest import mock
 
 from django.conf import settings
 from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 from django import forms
+from sorl.thumbnail.models import KVStore as KVStoreModel
 
-from ..models import Group, Follow, Post, User
+from core.cache import acquire_lock, release_lock
+from core.testing import run_on_commit
+
+from .. import feed
+from ..caching import (
+    bump_follow_generation, get_follow_generation, post_card_key
+)
+from ..follow_graph import graph
+from ..models import Comment, FeedEntry, Group, Follow, Post, User
+from ..pagecache import page_key
+from ..thumbnails import generate_thumbnails, resolve_thumbnails
+from ..variants import WIDTHS, enqueue_variants
 
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
 
-@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, VARIANT_WORKERS=0)
 class PostsPagesTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -219,20 +235,176 @@ class PostsPagesTests(TestCase):
         self.assertEqual(group_field_value, self.post.group)
 
     def test_index_page_cashe(self):
-        """Проверка кеширования главной страницы."""
+        """
+        Главная страница кешируется, а новый пост сбрасывает кеш
+        через поколение ленты.
+        """
         response = self.authorized_user.get(reverse('posts:index'))
         posts = response.content
-        Post.objects.create(
-            text='test_new_post',
-            author=self.user,
-        )
+        # Изменение в обход сигналов кеш не сбрасывает
+        Post.objects.filter(pk=self.post.pk).update(text='changed_text')
         response_old = self.authorized_user.get(reverse('posts:index'))
         old_posts = response_old.content
         self.assertEqual(old_posts, posts)
-        cache.clear()
+        with run_on_commit():
+            Post.objects.create(
+                text='test_new_post',
+                author=self.user,
+            )
         response_new = self.authorized_user.get(reverse('posts:index'))
         new_posts = response_new.content
         self.assertNotEqual(old_posts, new_posts)
+        self.assertIn('test_new_post', new_posts.decode())
+
+    def test_feed_cache_depends_on_page(self):
+        """Разные страницы ленты кешируются под разными ключами."""
+        for n in range(10):
+            Post.objects.create(text=f'Пост {n}', author=self.user)
+        first_page = self.authorized_user.get(reverse('posts:index'))
+        second_page = self.authorized_user.get(
+            reverse('posts:index') + '?page=2'
+        )
+        self.assertNotEqual(first_page.content, second_page.content)
+        self.assertIn(self.post.text, second_page.content.decode())
+
+    def test_post_card_is_cached_until_post_changes(self):
+        """
+        Карточка поста берётся из кеша, пока пост не изменён,
+        и используется на всех лентах.
+        """
+        key = post_card_key(self.post)
+        cache.set(key, '<article>cached_card</article>')
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user}),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.authorized_user.get(url)
+                self.assertContains(response, 'cached_card')
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Изменённый текст'
+        with run_on_commit():
+            post.save()
+        response = self.authorized_user.get(reverse('posts:index'))
+        self.assertNotContains(response, 'cached_card')
+        self.assertContains(response, 'Изменённый текст')
+
+    def test_post_card_follows_group_and_author_changes(self):
+        """Карточка обновляется при смене адреса группы и имени автора."""
+        group = Group.objects.create(title='Группа', slug='old-slug')
+        Post.objects.create(text='Пост группы', author=self.user, group=group)
+        response = self.authorized_user.get(reverse('posts:index'))
+        self.assertContains(response, '/group/old-slug/')
+        group.slug = 'new-slug'
+        user = User.objects.get(pk=self.user.pk)
+        user.first_name = 'Новое'
+        user.last_name = 'Имя'
+        with run_on_commit():
+            group.save()
+            user.save()
+        response = self.authorized_user.get(reverse('posts:index'))
+        self.assertNotContains(response, '/group/old-slug/')
+        self.assertContains(response, '/group/new-slug/')
+        self.assertContains(response, 'Новое Имя')
+
+    @override_settings(THUMBNAIL_WORKERS=0)
+    def test_thumbnail_placeholder_until_generated(self):
+        """Пока картинка не обработана, вместо неё показывается заглушка."""
+        post = Post.objects.create(
+            text='Новый пост',
+            author=self.user,
+            image=SimpleUploadedFile(
+                name='fresh.gif',
+                # Другое содержимое: одинаковые картинки хранятся одним
+                # файлом и делят уже построенные миниатюры
+                content=self.small_gif.replace(
+                    b'\xFF\xFF\xFF', b'\x00\x00\x00'
+                ),
+                content_type='image/gif'
+            )
+        )
+        url = reverse('posts:post_detail', kwargs={'post_id': post.id})
+        response = self.authorized_user.get(url)
+        self.assertContains(response, 'thumbnail_placeholder.svg')
+        # Первая отрисовка поставила обработку в очередь, при
+        # THUMBNAIL_WORKERS=0 и VARIANT_WORKERS=0 она выполнена синхронно
+        response = self.authorized_user.get(url)
+        self.assertNotContains(response, 'thumbnail_placeholder.svg')
+        self.assertContains(response, settings.MEDIA_URL + 'variants/')
+
+    def test_card_lists_image_variants(self):
+        """Карточка поста выводит <picture> с вариантами всех ширин."""
+        enqueue_variants(self.post)
+        response = self.authorized_user.get(reverse('posts:index'))
+        self.assertContains(response, '<picture>')
+        for width in WIDTHS:
+            with self.subTest(width=width):
+                self.assertContains(response, f'/{width}.jpg {width}w')
+
+    def make_broken_post(self):
+        """Пост с нечитаемой картинкой, записанной в поле напрямую."""
+        name = default_storage.save('posts/bad.jpg', ContentFile(b'not image'))
+        return Post.objects.create(text='Битый', author=self.user, image=name)
+
+    @override_settings(THUMBNAIL_WORKERS=0)
+    def test_broken_image_thumbnail_is_placeholder(self):
+        """Нечитаемая картинка даёт заглушку и не обрабатывается снова."""
+        post = self.make_broken_post()
+        generate_thumbnails(post)
+        with mock.patch('posts.thumbnails.enqueue_thumbnails') as enqueue:
+            resolve_thumbnails([post])
+        self.assertIsNone(post.thumbnail)
+        enqueue.assert_not_called()
+
+    @override_settings(THUMBNAIL_WORKERS=0)
+    def test_broken_image_does_not_break_pages(self):
+        """Нечитаемая картинка не роняет ленты и не обрабатывается снова."""
+        post = self.make_broken_post()
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:profile', kwargs={'username': self.user}),
+            reverse('posts:post_detail', kwargs={'post_id': post.pk}),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.authorized_user.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertContains(response, 'thumbnail_placeholder.svg')
+        with mock.patch('posts.variants.enqueue_variants') as enqueue:
+            self.authorized_user.get(urls[-1])
+        enqueue.assert_not_called()
+
+    def test_page_thumbnails_are_resolved_from_cache(self):
+        """Миниатюры страницы читаются из кэша без запросов к БД."""
+        posts = [self.post] + [
+            Post.objects.create(
+                text=f'Пост {n}',
+                author=self.user,
+                image=self.post.image.name
+            )
+            for n in range(3)
+        ]
+        generate_thumbnails(self.post)
+        with self.assertNumQueries(0):
+            resolve_thumbnails(posts)
+        for post in posts:
+            self.assertEqual(post.thumbnail['width'], 960)
+            self.assertTrue(post.thumbnail['url'].startswith(
+                settings.MEDIA_URL + 'cache/'
+            ))
+
+    def test_thumbnail_miss_is_queued_without_queries(self):
+        """Промах миниатюры — заглушка и очередь, без запросов к БД."""
+        generate_thumbnails(self.post)
+        self.assertFalse(KVStoreModel.objects.exists())
+        cache.clear()
+        with mock.patch('posts.thumbnails.enqueue_thumbnails') as enqueue:
+            with self.assertNumQueries(0):
+                resolve_thumbnails([self.post])
+        self.assertIsNone(self.post.thumbnail)
+        enqueue.assert_called_once_with(self.post)
 
 
 class PaginatorViewsTest(TestCase):
@@ -253,6 +425,7 @@ class PaginatorViewsTest(TestCase):
             )
 
     def setUp(self):
+        cache.clear()
         self.authorized_user = Client()
         self.authorized_user.force_login(self.user)
         self.reversed_urls = {
@@ -281,6 +454,317 @@ class PaginatorViewsTest(TestCase):
                     len(response.context['page_obj'].object_list), 3
                 )
 
+    def test_cursor_pages_follow_each_other(self):
+        """
+        Курсор следующей страницы ведёт на оставшиеся записи,
+        курсор предыдущей возвращает на первую страницу.
+        """
+        for reversed_url, maskurl in self.reversed_urls.items():
+            with self.subTest(reversed_url=reversed_url):
+                url = reverse(reversed_url, kwargs=maskurl)
+                first_page = self.client.get(url).context['page_obj']
+                self.assertIsNone(first_page.previous_cursor)
+                second_page = self.client.get(
+                    url, {'cursor': first_page.next_cursor}
+                ).context['page_obj']
+                self.assertEqual(len(second_page.object_list), 3)
+                self.assertIsNone(second_page.next_cursor)
+                back_page = self.client.get(
+                    url, {'cursor': second_page.previous_cursor}
+                ).context['page_obj']
+                self.assertEqual(
+                    back_page.object_list, first_page.object_list
+                )
+                self.assertIsNone(back_page.previous_cursor)
+
+    def test_broken_cursor_returns_first_page(self):
+        """Некорректный курсор отдаёт первую страницу."""
+        response = self.client.get(
+            reverse('posts:index'), {'cursor': 'broken!'}
+        )
+        self.assertEqual(len(response.context['page_obj'].object_list), 10)
+
+
+class SearchViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(
+            username='admin', is_staff=True, is_superuser=True
+        )
+        cls.relevant = Post.objects.create(
+            text='Кошки, кошки и ещё раз кошки <b>',
+            author=cls.user
+        )
+        cls.mention = Post.objects.create(
+            text='Про собак, а кошки только упомянуты',
+            author=cls.user
+        )
+        cls.other = Post.objects.create(text='Про собак', author=cls.user)
+
+    def search(self, query, **params):
+        return self.client.get(
+            reverse('posts:search'), {'q': query, **params}
+        )
+
+    def test_results_are_ranked_and_highlighted(self):
+        response = self.search('кошки')
+        posts = list(response.context['page_obj'])
+        self.assertEqual(posts, [self.relevant, self.mention])
+        self.assertIn('<mark>Кошки</mark>', posts[0].snippet)
+        self.assertIn('&lt;b&gt;', posts[0].snippet)
+        self.assertContains(response, '<mark>кошки</mark>', html=False)
+
+    def test_last_word_is_matched_by_prefix(self):
+        response = self.search('про соба')
+        self.assertEqual(
+            set(response.context['page_obj']), {self.mention, self.other}
+        )
+
+    def test_fts_operators_are_not_interpreted(self):
+        for query in ('', '"', 'NOT кошки', 'кошки OR*'):
+            with self.subTest(query=query):
+                response = self.search(query)
+                self.assertEqual(response.status_code, 200)
+
+    def test_index_follows_edits_and_deletes(self):
+        post = Post.objects.create(text='Про кроликов', author=self.user)
+        post.text = 'Про попугаев'
+        post.save()
+        self.assertFalse(self.search('кроликов').context['page_obj'])
+        self.assertEqual(
+            list(self.search('попугаев').context['page_obj']), [post]
+        )
+        post.delete()
+        self.assertFalse(self.search('попугаев').context['page_obj'])
+
+    def test_pagination_keeps_query(self):
+        Post.objects.bulk_create(
+            Post(text=f'Кошки {i}', author=self.user) for i in range(10)
+        )
+        response = self.search('кошки', page=2)
+        self.assertEqual(len(response.context['page_obj']), 2)
+        self.assertContains(response, 'href="?q=%D0%BA%D0%BE%D1%88%D0%BA'
+                                      '%D0%B8&amp;page=1"')
+
+    def test_admin_search_uses_index(self):
+        self.client.force_login(self.user)
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'упомянуты'}
+        )
+        self.assertEqual(
+            list(response.context['cl'].result_list), [self.mention]
+        )
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_user')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='test_group',
+            description='test_group_description',
+            slug='test_slug'
+        )
+        cls.post = Post.objects.create(
+            text='Тестовый текст',
+            author=cls.user,
+            group=cls.group
+        )
+        cls.urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': cls.group.slug}),
+            reverse('posts:profile', kwargs={'username': cls.user}),
+            reverse('posts:post_detail', kwargs={'post_id': cls.post.pk}),
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_unchanged_pages_are_not_modified(self):
+        for client in (self.client, self.reader_client):
+            for url in self.urls:
+                with self.subTest(url=url, client=client):
+                    # Первый ответ с формой выдаёт CSRF-куку,
+                    # она входит в ETag
+                    client.get(url)
+                    etag = client.get(url)['ETag']
+                    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+                    self.assertEqual(response.status_code, 304)
+
+    def test_not_modified_skips_feed_query(self):
+        etag = self.client.get(self.urls[0])['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(
+                self.urls[0], HTTP_IF_NONE_MATCH=etag
+            )
+        self.assertEqual(response.status_code, 304)
+
+    def test_etag_changes_with_post_and_viewer(self):
+        etags = {url: self.client.get(url)['ETag'] for url in self.urls}
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                self.assertNotEqual(self.reader_client.get(url)['ETag'], etag)
+        self.post.text = 'Новый текст'
+        with run_on_commit():
+            self.post.save()
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+
+    def test_profile_etag_changes_on_follow(self):
+        url = reverse('posts:profile', kwargs={'username': self.user})
+        etag = self.reader_client.get(url)['ETag']
+        Follow.objects.create(user=self.reader, author=self.user)
+        response = self.reader_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_stale_fragment_has_no_validators(self):
+        """Страница со старым фрагментом ленты уходит без ETag."""
+        url = self.urls[0]
+        context = self.reader_client.get(url).context
+        key = make_template_fragment_key(
+            'index_page', [context['cache_key']]
+        )
+        with run_on_commit():
+            Post.objects.create(text='Свежий пост', author=self.user)
+        acquire_lock(key)
+        try:
+            response = self.reader_client.get(url)
+        finally:
+            release_lock(key)
+        self.assertNotContains(response, 'Свежий пост')
+        self.assertFalse(response.has_header('ETag'))
+        response = self.reader_client.get(url)
+        self.assertContains(response, 'Свежий пост')
+        self.assertTrue(response.has_header('ETag'))
+
+    def test_last_modified_only_for_anonymous(self):
+        with run_on_commit():
+            self.post.save()
+        last_modified = self.client.get(self.urls[0])['Last-Modified']
+        response = self.client.get(
+            self.urls[0], HTTP_IF_MODIFIED_SINCE=last_modified
+        )
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse(
+            self.reader_client.get(self.urls[0]).has_header('Last-Modified')
+        )
+
+
+class AnonymousPageCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_user')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='test_group', description='-', slug='test_slug'
+        )
+        cls.other_group = Group.objects.create(
+            title='other_group', description='-', slug='other_slug'
+        )
+        cls.post = Post.objects.create(
+            text='Тестовый текст', author=cls.user, group=cls.group
+        )
+        cls.other_post = Post.objects.create(
+            text='Другой текст', author=cls.reader, group=cls.other_group
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def assertCached(self, url):
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_anonymous_pages_are_cached(self):
+        for url in (
+            reverse('posts:index'),
+            reverse('posts:index') + '?page=1',
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        ):
+            with self.subTest(url=url):
+                self.assertCached(url)
+
+    def test_authenticated_pages_are_not_cached(self):
+        self.client.force_login(self.reader)
+        self.client.get(reverse('posts:index'))
+        response = self.client.get(reverse('posts:index'))
+        self.assertIsNotNone(response.context)
+
+    def test_post_change_purges_only_its_pages(self):
+        group_url = reverse(
+            'posts:group_list', kwargs={'slug': self.group.slug}
+        )
+        other_url = reverse(
+            'posts:group_list', kwargs={'slug': self.other_group.slug}
+        )
+        self.client.get(group_url)
+        self.client.get(other_url)
+        self.post.text = 'Новый текст'
+        with run_on_commit():
+            self.post.save()
+        self.assertContains(self.client.get(group_url), 'Новый текст')
+        with self.assertNumQueries(0):
+            self.client.get(other_url)
+
+    def test_new_post_purges_feeds(self):
+        url = reverse('posts:index')
+        self.client.get(url)
+        with run_on_commit():
+            Post.objects.create(text='Свежий пост', author=self.reader)
+        self.assertContains(self.client.get(url), 'Свежий пост')
+
+    def test_purge_waits_for_commit(self):
+        """До фиксации транзакции страница не сбрасывается."""
+        url = reverse('posts:index')
+        self.client.get(url)
+        Post.objects.create(text='Свежий пост', author=self.reader)
+        self.assertNotContains(self.client.get(url), 'Свежий пост')
+
+    def test_comment_purges_post_page(self):
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        self.client.get(url)
+        with run_on_commit():
+            Comment.objects.create(
+                post=self.post, author=self.reader, text='Комментарий'
+            )
+        self.assertContains(self.client.get(url), 'Комментарий')
+
+    def test_stale_page_served_while_other_request_renders(self):
+        url = reverse('posts:index')
+        self.client.get(url)
+        with run_on_commit():
+            Post.objects.create(text='Свежий пост', author=self.reader)
+        key = page_key(self.client.get(url).wsgi_request)
+        cache.set(key, {**cache.get(key), 'content': b'old'})
+        with run_on_commit():
+            Post.objects.create(text='Ещё пост', author=self.reader)
+        acquire_lock(key)
+        try:
+            response = self.client.get(url)
+        finally:
+            release_lock(key)
+        self.assertEqual(response.content, b'old')
+        self.assertFalse(response.has_header('ETag'))
+        self.assertFalse(response.has_header('Last-Modified'))
+        self.assertContains(self.client.get(url), 'Ещё пост')
+
+    def test_follow_purges_profiles(self):
+        url = reverse('posts:profile', kwargs={'username': self.user})
+        self.client.get(url)
+        with run_on_commit():
+            Follow.objects.create(user=self.reader, author=self.user)
+        self.assertContains(self.client.get(url), 'Подписчиков: 1')
+
 
 class CreationPostTest(TestCase):
     @classmethod
@@ -353,6 +837,9 @@ class FollowingTest(TestCase):
         )
 
     def setUp(self):
+        # Граф подписок процесса не откатывается вместе с базой теста
+        cache.clear()
+        graph.clear()
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
 
@@ -398,3 +885,209 @@ class FollowingTest(TestCase):
         response_2 = authorized_client_2.get(reverse('posts:follow_index'))
         self.assertEqual(response.context['page_obj'][0].text, self.post.text)
         self.assertEqual(len(response_2.context['page_obj']), 0)
+
+    def test_feed_is_filled_on_follow_and_cleared_on_unfollow(self):
+        """
+        При подписке лента заполняется постами автора,
+        при отписке они из неё удаляются.
+        """
+        self.authorized_client.post(
+            reverse(
+                'posts:profile_follow',
+                kwargs={'username': self.author.username}
+            )
+        )
+        self.assertTrue(
+            FeedEntry.objects.filter(user=self.user, post=self.post).exists()
+        )
+        self.authorized_client.post(
+            reverse(
+                'posts:profile_unfollow',
+                kwargs={'username': self.author.username}
+            )
+        )
+        self.assertFalse(FeedEntry.objects.filter(user=self.user).exists())
+
+    def test_follow_graph_is_updated_in_place(self):
+        """Подписка и отписка правят граф без повторного чтения базы."""
+        self.assertEqual(graph.following_count(self.user.pk), 0)
+        self.assertEqual(graph.followers_count(self.author.pk), 0)
+        with run_on_commit():
+            follow = Follow.objects.create(
+                user=self.user, author=self.author
+            )
+        with self.assertNumQueries(0):
+            self.assertTrue(graph.is_following(self.user.pk, self.author.pk))
+            self.assertEqual(
+                graph.following_among(
+                    self.user.pk, [self.author.pk, self.user_2.pk]
+                ),
+                {self.author.pk}
+            )
+            self.assertEqual(graph.followers_count(self.author.pk), 1)
+        with run_on_commit():
+            follow.delete()
+        with self.assertNumQueries(0):
+            self.assertFalse(graph.is_following(self.user.pk, self.author.pk))
+            self.assertEqual(graph.followers_count(self.author.pk), 0)
+
+    def test_follow_graph_waits_for_commit(self):
+        """До фиксации транзакции поколения и массивы графа прежние."""
+        generation = get_follow_generation(self.user.pk)
+        self.assertFalse(graph.is_following(self.user.pk, self.author.pk))
+        Follow.objects.create(user=self.user, author=self.author)
+        self.assertEqual(get_follow_generation(self.user.pk), generation)
+        with self.assertNumQueries(0):
+            self.assertFalse(graph.is_following(self.user.pk, self.author.pk))
+
+    def test_follow_graph_reloads_after_foreign_change(self):
+        """Изменение из другого процесса видно по смене поколения."""
+        self.assertFalse(graph.is_following(self.user.pk, self.author.pk))
+        # bulk_create не шлёт сигналов, как запись в другом процессе
+        Follow.objects.bulk_create(
+            [Follow(user=self.user, author=self.author)]
+        )
+        self.assertFalse(graph.is_following(self.user.pk, self.author.pk))
+        bump_follow_generation(self.user.pk)
+        self.assertTrue(graph.is_following(self.user.pk, self.author.pk))
+
+    def test_follow_does_not_trust_stale_graph(self):
+        """Повторная подписка при отставшем графе не падает."""
+        self.assertFalse(graph.is_following(self.user.pk, self.author.pk))
+        # Подписка из другого процесса, о которой граф ещё не знает
+        Follow.objects.bulk_create(
+            [Follow(user=self.user, author=self.author)]
+        )
+        response = self.authorized_client.get(
+            reverse(
+                'posts:profile_follow',
+                kwargs={'username': self.author.username}
+            )
+        )
+        self.assertRedirects(response, reverse('posts:index'))
+        self.assertEqual(Follow.objects.count(), 1)
+
+    def test_index_marks_followed_authors(self):
+        """Карточки постов авторов из подписок получают значок."""
+        badge = 'Вы подписаны'
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertNotContains(response, badge)
+        with run_on_commit():
+            Follow.objects.create(user=self.user, author=self.author)
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(response, badge, count=1)
+        client_2 = Client()
+        client_2.force_login(self.user_2)
+        response = client_2.get(reverse('posts:index'))
+        self.assertNotContains(response, badge)
+
+    def test_follow_lists(self):
+        """Списки подписчиков и подписок показывают пользователей и число."""
+        Follow.objects.create(user=self.user, author=self.author)
+        Follow.objects.create(user=self.user_2, author=self.author)
+        response = self.authorized_client.get(
+            reverse('posts:followers', kwargs={'username': self.author})
+        )
+        self.assertEqual(response.context['users'], [self.user_2, self.user])
+        self.assertEqual(response.context['count'], 2)
+        response = self.authorized_client.get(
+            reverse('posts:following', kwargs={'username': self.user})
+        )
+        self.assertEqual(response.context['users'], [self.author])
+        self.assertEqual(response.context['count'], 1)
+
+    def test_follow_list_cursor_pages(self):
+        """Список подписчиков листается курсором в обе стороны."""
+        followers = [
+            User.objects.create_user(username=f'follower_{n}')
+            for n in range(5)
+        ]
+        for follower in followers:
+            Follow.objects.create(user=follower, author=self.author)
+        url = reverse('posts:followers', kwargs={'username': self.author})
+        with mock.patch('posts.views.NUMBER_OF_USERS_DISPLAYED', 2):
+            response = self.authorized_client.get(url)
+            self.assertEqual(response.context['users'], followers[:2:-1])
+            next_cursor = response.context['page_obj'].next_cursor
+            response = self.authorized_client.get(
+                url, {'cursor': next_cursor}
+            )
+            self.assertEqual(response.context['users'], followers[2:0:-1])
+            previous_cursor = response.context['page_obj'].previous_cursor
+            response = self.authorized_client.get(
+                url, {'cursor': previous_cursor}
+            )
+            self.assertEqual(response.context['users'], followers[:2:-1])
+        self.assertEqual(response.context['count'], 5)
+
+    @override_settings(FOLLOW_FEED_LENGTH=2)
+    def test_push_trims_all_feeds_in_one_query(self):
+        """Раскладка поста обрезает ленты всех подписчиков разом."""
+        readers = [self.user, self.user_2] + [
+            User.objects.create_user(username=f'reader_{n}')
+            for n in range(3)
+        ]
+        for reader in readers:
+            Follow.objects.create(user=reader, author=self.author)
+        new_posts = [
+            Post.objects.create(author=self.author, text=f'Пост {n}')
+            for n in range(2)
+        ]
+        post = Post.objects.create(author=self.author, text='Ещё пост')
+        # Выборка подписчиков, вставка записей и один DELETE
+        with self.assertNumQueries(3):
+            feed.push_post(post)
+        for reader in readers:
+            with self.subTest(reader=reader):
+                self.assertEqual(
+                    list(reader.feed_entries.values_list('post', flat=True)),
+                    [post.pk, new_posts[-1].pk]
+                )
+
+    @override_settings(FOLLOW_FEED_LENGTH=3)
+    def test_feed_length_is_bounded(self):
+        """Лента подписок обрезается до FOLLOW_FEED_LENGTH записей."""
+        Follow.objects.create(user=self.user, author=self.author)
+        new_posts = [
+            Post.objects.create(author=self.author, text=f'Пост {n}')
+            for n in range(5)
+        ]
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            list(response.context['page_obj']), new_posts[:-4:-1]
+        )
+
+    @override_settings(
+        FOLLOW_FEED_STRATEGY='hybrid',
+        FOLLOW_FEED_CELEBRITY_THRESHOLD=2
+    )
+    def test_hybrid_feed_merges_pushed_and_pulled_posts(self):
+        """
+        В гибридной ленте посты популярного автора не раскладываются,
+        но выводятся вместе с разложенными постами по дате.
+        """
+        ordinary_author = User.objects.create_user(username='ordinary')
+        Follow.objects.create(user=self.user_2, author=self.author)
+        Follow.objects.create(user=self.user, author=self.author)
+        Follow.objects.create(user=self.user, author=ordinary_author)
+        new_posts = [
+            Post.objects.create(author=author, text=f'Пост {n}')
+            for n, author in enumerate(
+                [self.author, ordinary_author, self.author, ordinary_author]
+            )
+        ]
+        self.assertFalse(
+            FeedEntry.objects.filter(post__in=new_posts[::2]).exists()
+        )
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            list(response.context['page_obj']),
+            new_posts[::-1] + [self.post]
+        )
+        response = self.authorized_client.get(
+            reverse('posts:follow_index') + '?page=1'
+        )
+        self.assertEqual(
+            list(response.context['page_obj']),
+            new_posts[::-1] + [self.post]
+        )
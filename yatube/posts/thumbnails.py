@@ -0,0 +1,210 @@
+"""
+Заблаговременная генерация миниатюр картинок постов.
+
+После сохранения поста с картинкой миниатюры всех известных размеров
+строятся в фоновом пуле потоков (PIL отпускает GIL при декодировании
+и масштабировании), а не при первой отрисовке страницы. Пока миниатюры
+нет, шаблоны показывают заглушку.
+
+Шаблоны не обращаются к хранилищу ключей sorl: resolve_thumbnails
+одним get_many из кэша проставляет постам страницы post.thumbnail.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from django.dispatch import Signal
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile
+
+logger = logging.getLogger(__name__)
+
+# Размеры миниатюр, которые используют шаблоны постов
+GEOMETRIES = {
+    'card': ('960x339', {'crop': 'center', 'upscale': True}),
+}
+
+# Сломанную картинку снова пробуют обработать не раньше, чем через
+# столько секунд; до того шаблоны показывают заглушку
+FAILURE_TIMEOUT = 60 * 60
+
+# Миниатюры поста построены: карточки с заглушкой устарели (posts.signals)
+thumbnails_ready = Signal()
+
+_executor = None
+_pending = set()
+_lock = threading.Lock()
+
+
+class Backend(ThumbnailBackend):
+    """Бэкенд sorl, умеющий вычислить файл миниатюры без её генерации."""
+
+    def get_thumbnail_file(self, file_, geometry_string, **options):
+        """Файл миниатюры с теми же именем и опциями, что у get_thumbnail."""
+        source = ImageFile(file_)
+        if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(sorl_settings, attr)
+            if value != getattr(sorl_defaults, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return ImageFile(name, default.storage)
+
+
+backend = Backend()
+
+
+def get_workers():
+    return getattr(settings, 'THUMBNAIL_WORKERS', 2)
+
+
+def get_inline_max_bytes():
+    return getattr(settings, 'IMAGE_INLINE_MAX_BYTES', 64 * 1024)
+
+
+def source_exists(image_name):
+    try:
+        return default_storage.exists(image_name)
+    except SuspiciousFileOperation:
+        # Путь вне MEDIA_ROOT (например, записанный в поле напрямую)
+        return False
+
+
+def run_inline(image):
+    """Мелкие картинки дешевле обработать сразу, чем ставить в очередь."""
+    return image.size <= get_inline_max_bytes()
+
+
+def get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=get_workers(),
+                thread_name_prefix='thumbnails'
+            )
+    return _executor
+
+
+def thumbnail_key(thumbnail):
+    return f'thumbnail:{thumbnail.name}'
+
+
+def thumbnail_info(thumbnail):
+    return {
+        'url': thumbnail.url,
+        'width': thumbnail.width,
+        'height': thumbnail.height,
+    }
+
+
+def get_cache_timeout():
+    return sorl_settings.THUMBNAIL_CACHE_TIMEOUT
+
+
+def build_thumbnail(image_name, geometry, options):
+    """Данные миниатюры или None, если картинку не удалось прочитать."""
+    try:
+        thumbnail = backend.get_thumbnail(image_name, geometry, **options)
+        # При ошибке sorl только пишет в лог и возвращает ненаписанный файл
+        if thumbnail.exists():
+            return thumbnail_info(thumbnail)
+    except Exception:
+        logger.exception('Миниатюра %s не построена', image_name)
+    return None
+
+
+def generate_thumbnails(post):
+    """
+    Строит миниатюры всех размеров и сразу кладёт их в кэш. Неудача
+    запоминается в кэше как False на FAILURE_TIMEOUT, чтобы страницы
+    не пытались обработать сломанную картинку при каждой отрисовке.
+    """
+    built = False
+    for geometry, options in GEOMETRIES.values():
+        thumbnail = backend.get_thumbnail_file(
+            post.image.name, geometry, **options
+        )
+        info = build_thumbnail(post.image.name, geometry, options)
+        if info is None:
+            cache.set(thumbnail_key(thumbnail), False, FAILURE_TIMEOUT)
+            continue
+        cache.set(thumbnail_key(thumbnail), info, get_cache_timeout())
+        built = True
+    if built:
+        thumbnails_ready.send(sender=post.__class__, post=post)
+
+
+def run_in_worker(post):
+    try:
+        generate_thumbnails(post)
+    finally:
+        with _lock:
+            _pending.discard(post.image.name)
+        connections.close_all()
+
+
+def enqueue_thumbnails(post):
+    """Ставит генерацию миниатюр в очередь, если она ещё не поставлена."""
+    if not source_exists(post.image.name):
+        return
+    with _lock:
+        if post.image.name in _pending:
+            return
+        _pending.add(post.image.name)
+    if get_workers() and not run_inline(post.image):
+        get_executor().submit(run_in_worker, post)
+    else:
+        try:
+            generate_thumbnails(post)
+        finally:
+            with _lock:
+                _pending.discard(post.image.name)
+
+
+def schedule_thumbnails(post):
+    """Генерация миниатюр после фиксации транзакции с постом."""
+    if post.image:
+        transaction.on_commit(lambda: enqueue_thumbnails(post))
+
+
+def resolve_thumbnails(posts, size='card'):
+    """
+    Проставляет постам атрибут thumbnail — словарь url/width/height
+    или None, если миниатюры ещё нет или её не удалось построить.
+    Все миниатюры читаются одним get_many без обращений к хранилищу
+    ключей sorl: на промахе пост получает заглушку, а миниатюра
+    ставится в очередь (готовый файл sorl не перестраивает).
+    """
+    geometry, options = GEOMETRIES[size]
+    posts = list(posts)
+    # Имя, а не FieldFile: ключ миниатюры sorl зависит от хранилища
+    # источника, и он должен совпасть с ключом из generate_thumbnails
+    files = {
+        post.pk: backend.get_thumbnail_file(
+            post.image.name, geometry, **options
+        )
+        for post in posts if post.image
+    }
+    keys = {pk: thumbnail_key(thumbnail) for pk, thumbnail in files.items()}
+    found = cache.get_many(keys.values())
+    for post in posts:
+        key = keys.get(post.pk)
+        if key is not None and key not in found:
+            # Посты с одной картинкой ставят её в очередь один раз
+            found[key] = None
+            enqueue_thumbnails(post)
+    for post in posts:
+        post.thumbnail = found.get(keys.get(post.pk)) or None
+    return posts
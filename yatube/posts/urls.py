@@ -8,10 +8,24 @@ urlpatterns = [
     path('group/<slug:slug>/', views.group_posts, name='group_list'),
     # Профайл пользователя
     path('profile/<str:username>/', views.profile, name='profile'),
+    # Подписчики пользователя
+    path(
+        'profile/<str:username>/followers/',
+        views.followers,
+        name='followers'
+    ),
+    # Авторы, на которых подписан пользователь
+    path(
+        'profile/<str:username>/following/',
+        views.following,
+        name='following'
+    ),
     # Страница для создания записи
     path('create/', views.post_create, name='post_create'),
     # Страница редактирования записи
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
+    # Поиск по постам
+    path('search/', views.search, name='search'),
     # Страница для просмотра записи
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
     # Комментарии
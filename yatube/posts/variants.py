@@ -0,0 +1,237 @@
+"""
+Адаптивные варианты картинок постов для <picture> и srcset.
+
+Для каждой картинки строятся копии нескольких ширин (WIDTHS) в
+пропорциях карточки и во всех форматах, которые умеет кодировать
+установленный Pillow: AVIF и WebP при поддержке сборки, JPEG всегда.
+Кодирование идёт в ProcessPoolExecutor, чтобы пачки картинок занимали
+все ядра; процессы пула работают только с файлами и не трогают Django.
+Рядом с вариантами пишется manifest.json, шаблоны получают его через
+кэш (resolve_pictures).
+"""
+import json
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image, ImageOps
+
+from .thumbnails import (
+    FAILURE_TIMEOUT, run_inline, source_exists, thumbnails_ready
+)
+
+logger = logging.getLogger(__name__)
+
+WIDTHS = (320, 640, 960)
+# Пропорции карточки поста 960x339
+ASPECT = 339 / 960
+# Форматы в порядке предпочтения; последний — запасной для <img>
+FORMATS = (
+    ('AVIF', 'avif', 'image/avif'),
+    ('WEBP', 'webp', 'image/webp'),
+    ('JPEG', 'jpg', 'image/jpeg'),
+)
+MANIFEST = 'manifest.json'
+# Метка в кэше вместо манифеста: картинку не удалось обработать
+FAILED = 'failed'
+SIZES = '(max-width: 960px) 100vw, 960px'
+
+_executor = None
+_pending = set()
+_lock = threading.Lock()
+
+
+def get_formats():
+    Image.init()
+    return [format for format in FORMATS if format[0] in Image.SAVE]
+
+
+def get_workers():
+    return getattr(settings, 'VARIANT_WORKERS', os.cpu_count())
+
+
+def get_quality():
+    return getattr(settings, 'POST_IMAGE_QUALITY', 85)
+
+
+def get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            # spawn: дочерние процессы не наследуют соединения с БД
+            # и потоки веб-сервера
+            _executor = ProcessPoolExecutor(
+                max_workers=get_workers(),
+                mp_context=multiprocessing.get_context('spawn')
+            )
+    return _executor
+
+
+def get_variants_dir(image_name):
+    root, _ = os.path.splitext(image_name)
+    return f'variants/{root}'
+
+
+def variants_key(image_name):
+    return f'variants:{image_name}'
+
+
+def build_variants(source_path, target_dir, formats, quality):
+    """
+    Строит варианты картинки и manifest.json; выполняется в процессе
+    пула. Возвращает манифест: {mime: [[ширина, имя файла], ...]}.
+    """
+    manifest = {}
+    # Исходник открывается до создания каталогов: если его успели
+    # удалить, после задачи не останется пустых каталогов
+    with Image.open(source_path) as image:
+        width = max(WIDTHS)
+        image.draft('RGB', (width, round(width * ASPECT)))
+        image = ImageOps.exif_transpose(image).convert('RGB')
+    os.makedirs(target_dir, exist_ok=True)
+    for width in sorted(WIDTHS, reverse=True):
+        variant = ImageOps.fit(
+            image, (width, round(width * ASPECT)), Image.LANCZOS
+        )
+        for format, extension, mime in formats:
+            name = f'{width}.{extension}'
+            variant.save(
+                os.path.join(target_dir, name), format, quality=quality
+            )
+            manifest.setdefault(mime, []).insert(0, [width, name])
+        # Меньшие варианты уменьшаются из предыдущего, а не из исходника
+        image = variant
+    with open(os.path.join(target_dir, MANIFEST), 'w') as output:
+        json.dump(manifest, output)
+    return manifest
+
+
+def build_arguments(image_name):
+    return (
+        default_storage.path(image_name),
+        default_storage.path(get_variants_dir(image_name)),
+        get_formats(),
+        get_quality(),
+    )
+
+
+def variants_built(post, manifest):
+    cache.set(variants_key(post.image.name), manifest, None)
+    thumbnails_ready.send(sender=post.__class__, post=post)
+
+
+def finish_variants(post, get_manifest):
+    """
+    Сохраняет результат построения. Неудача запоминается меткой FAILED
+    на FAILURE_TIMEOUT: пока она в кэше, страницы показывают заглушку
+    и не ставят сломанную картинку в очередь снова.
+    """
+    try:
+        manifest = get_manifest()
+    except FileNotFoundError:
+        logger.warning('Картинка %s удалена до обработки', post.image.name)
+        return
+    except Exception:
+        logger.exception('Варианты %s не построены', post.image.name)
+        cache.set(variants_key(post.image.name), FAILED, FAILURE_TIMEOUT)
+        return
+    variants_built(post, manifest)
+
+
+def on_done(post, future):
+    with _lock:
+        _pending.discard(post.image.name)
+    finish_variants(post, future.result)
+
+
+def enqueue_variants(post):
+    """Ставит построение вариантов в очередь, если оно ещё не поставлено."""
+    if not source_exists(post.image.name):
+        return
+    with _lock:
+        if post.image.name in _pending:
+            return
+        _pending.add(post.image.name)
+    arguments = build_arguments(post.image.name)
+    if get_workers() and not run_inline(post.image):
+        future = get_executor().submit(build_variants, *arguments)
+        future.add_done_callback(partial(on_done, post))
+    else:
+        try:
+            finish_variants(post, partial(build_variants, *arguments))
+        finally:
+            with _lock:
+                _pending.discard(post.image.name)
+
+
+def schedule_variants(post):
+    """Построение вариантов после фиксации транзакции с постом."""
+    if post.image:
+        transaction.on_commit(lambda: enqueue_variants(post))
+
+
+def read_manifest(image_name):
+    name = f'{get_variants_dir(image_name)}/{MANIFEST}'
+    if not default_storage.exists(name):
+        return None
+    with default_storage.open(name) as manifest:
+        return json.load(manifest)
+
+
+def get_picture(image_name, manifest):
+    """Данные для <picture>: источники современных форматов и <img>."""
+    base = default_storage.url(get_variants_dir(image_name))
+    srcsets = {
+        mime: ', '.join(f'{base}/{name} {width}w' for width, name in items)
+        for mime, items in manifest.items()
+    }
+    fallback = srcsets.pop('image/jpeg')
+    return {
+        'sources': [
+            {'type': mime, 'srcset': srcset}
+            for mime, srcset in srcsets.items()
+        ],
+        'srcset': fallback,
+        'src': f'{base}/{manifest["image/jpeg"][-1][1]}',
+        'sizes': SIZES,
+    }
+
+
+def resolve_pictures(posts):
+    """
+    Проставляет постам атрибут picture (или None, пока вариантов нет
+    или если их не удалось построить).
+    Манифесты читаются одним get_many; промахи — из manifest.json
+    и досылаются в кэш одним set_many, недостающие ставятся в очередь.
+    """
+    posts = list(posts)
+    keys = {
+        post.pk: variants_key(post.image.name) for post in posts if post.image
+    }
+    found = cache.get_many(keys.values())
+    missing = {}
+    for post in posts:
+        key = keys.get(post.pk)
+        if key is None or key in found:
+            continue
+        manifest = read_manifest(post.image.name)
+        if manifest is None:
+            enqueue_variants(post)
+            continue
+        found[key] = missing[key] = manifest
+    if missing:
+        cache.set_many(missing, None)
+    for post in posts:
+        manifest = found.get(keys.get(post.pk))
+        if manifest is None or manifest == FAILED:
+            post.picture = None
+        else:
+            post.picture = get_picture(post.image.name, manifest)
+    return posts
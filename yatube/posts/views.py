@@ -1,77 +1,206 @@
+from urllib.parse import urlencode
+
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
+from django.db import transaction
 from django.shortcuts import get_object_or_404, redirect, render
 
+from core.paginator import CursorPaginator, KeyCursorPaginator
+
+from . import feed, pagecache
+from .caching import get_feed_cache_context
+from .conditional import (
+    conditional, feed_last_modified, group_etag, index_etag, post_etag,
+    profile_etag
+)
+from .follow_graph import graph
 from .forms import CommentForm, PostForm
 from .models import Group, Follow, Post
+from .pagecache import cache_anonymous_page
+from .search import search_posts
+from .thumbnails import resolve_thumbnails, schedule_thumbnails
+from .variants import resolve_pictures, schedule_variants
 
 
 User = get_user_model()
 
 NUMBER_OF_POSTS_DISPLAYED: int = 10
+NUMBER_OF_USERS_DISPLAYED: int = 20
 
 
 def get_page_object(request, input_list, number_of_records):
-    paginator = Paginator(input_list, number_of_records)
+    paginator = CursorPaginator(input_list, number_of_records)
+    return get_paginated_page(request, paginator)
+
+
+def get_paginated_page(request, paginator):
     page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    return page_obj
+    # Старые ссылки вида ?page=N обслуживаем постраничным режимом
+    if page_number is not None:
+        return paginator.get_page(page_number)
+    return paginator.get_cursor_page(request.GET.get('cursor'))
 
 
+@conditional(etag_func=index_etag, last_modified_func=feed_last_modified)
+@cache_anonymous_page
 def index(request):
     template = 'posts/index.html'
-    post_list = Post.objects.select_related('author').all()
+    post_list = Post.objects.select_related('author', 'group')
     page_obj = get_page_object(request, post_list, NUMBER_OF_POSTS_DISPLAYED)
+    pagecache.add_tags(request, 'index')
+    pagecache.add_post_tags(request, page_obj)
     context = {
         'title': 'Последние обновления на сайте',
         'page_obj': page_obj,
         'index': True,
+        **get_feed_cache_context(request, per_viewer=True),
     }
     return render(request, template, context)
 
 
+@conditional(etag_func=group_etag, last_modified_func=feed_last_modified)
+@cache_anonymous_page
 def group_posts(request, slug):
     template = 'posts/group_list.html'
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
+    posts = group.posts.select_related('author', 'group')
     page_obj = get_page_object(request, posts, NUMBER_OF_POSTS_DISPLAYED)
+    pagecache.add_tags(request, f'group:{group.pk}')
+    pagecache.add_post_tags(request, page_obj)
     context = {
         'title': f'Записи сообщества {slug}',
         'group': group,
         'page_obj': page_obj,
+        **get_feed_cache_context(request, group.pk, per_viewer=True),
     }
     return render(request, template, context)
 
 
+@conditional(etag_func=profile_etag)
+@cache_anonymous_page
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    author_posts = author.posts.all()
+    # Автора уже выбрал profile_etag
+    author = getattr(request, 'profile_author', None)
+    if author is None:
+        author = get_object_or_404(
+            User.objects.select_related('stats'),
+            username=username
+        )
+    author_posts = author.posts.select_related('author', 'group')
     page_obj = get_page_object(
         request,
         author_posts,
         NUMBER_OF_POSTS_DISPLAYED
     )
-    if request.user.is_authenticated:
-        if Follow.objects.filter(user=request.user, author=author).exists():
-            is_follower = True
-        else:
-            is_follower = False
-    else:
-        is_follower = False
+    pagecache.add_tags(request, f'author:{author.pk}', f'profile:{author.pk}')
+    pagecache.add_post_tags(request, page_obj)
+    is_follower = (
+        request.user.is_authenticated
+        and graph.is_following(request.user.pk, author.pk)
+    )
     context = {
         'title': 'Профайл пользователя',
         'page_obj': page_obj,
         'author': author,
         'following': is_follower,
+        **get_feed_cache_context(request, author.pk),
     }
     return render(request, 'posts/profile.html', context)
 
 
+def get_follow_list_page(request, follows):
+    paginator = KeyCursorPaginator(follows, NUMBER_OF_USERS_DISPLAYED)
+    return paginator.get_cursor_page(request.GET.get('cursor'))
+
+
+def render_follow_list(request, author, title, count_field, follows, side):
+    """
+    Страница списка подписчиков или подписок: пользователи берутся
+    из поля side подписок, число — из счётчика UserStats count_field.
+    """
+    # У пользователей до появления UserStats счётчиков может не быть
+    count = getattr(getattr(author, 'stats', None), count_field, 0)
+    page_obj = get_follow_list_page(request, follows.select_related(side))
+    users = [getattr(follow, side) for follow in page_obj]
+    pagecache.add_tags(request, f'profile:{author.pk}')
+    pagecache.add_tags(request, *(f'author:{user.pk}' for user in users))
+    context = {
+        'title': title,
+        'author': author,
+        'count': count,
+        'users': users,
+        'page_obj': page_obj,
+    }
+    return render(request, 'posts/follow_list.html', context)
+
+
+@cache_anonymous_page
+def followers(request, username):
+    author = get_object_or_404(
+        User.objects.select_related('stats'),
+        username=username
+    )
+    return render_follow_list(
+        request,
+        author,
+        'Подписчики',
+        'followers_count',
+        author.following.all(),
+        'user'
+    )
+
+
+@cache_anonymous_page
+def following(request, username):
+    author = get_object_or_404(
+        User.objects.select_related('stats'),
+        username=username
+    )
+    return render_follow_list(
+        request,
+        author,
+        'Подписки',
+        'following_count',
+        author.follower.all(),
+        'author'
+    )
+
+
+def search(request):
+    query = request.GET.get('q', '').strip()
+    paginator = Paginator(search_posts(query), NUMBER_OF_POSTS_DISPLAYED)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    posts = list(page_obj.object_list)
+    resolve_pictures(posts)
+    resolve_thumbnails([post for post in posts if not post.picture])
+    context = {
+        'title': 'Поиск',
+        'query': query,
+        'page_obj': page_obj,
+        'page_query': urlencode({'q': query}) + '&',
+    }
+    return render(request, 'posts/search.html', context)
+
+
+@conditional(etag_func=post_etag, last_modified_func=feed_last_modified)
+@cache_anonymous_page
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'),
+        id=post_id
+    )
+    resolve_pictures([post])
+    if not post.picture:
+        resolve_thumbnails([post])
     form = CommentForm()
-    comments = post.comments.all()
+    comments = post.comments.select_related('author')
+    pagecache.add_post_tags(request, [post])
+    if pagecache.is_collecting(request):
+        pagecache.add_tags(
+            request,
+            *(f'author:{comment.author_id}' for comment in comments)
+        )
     context = {
         'post': post,
         'form': form,
@@ -81,6 +210,7 @@ def post_detail(request, post_id):
 
 
 @login_required
+@transaction.atomic
 def post_create(request):
     if request.method == 'POST':
         form = PostForm(request.POST or None, files=request.FILES or None)
@@ -88,6 +218,8 @@ def post_create(request):
             new_post = form.save(commit=False)
             new_post.author = request.user
             form.save()
+            schedule_thumbnails(new_post)
+            schedule_variants(new_post)
             return redirect('posts:profile', request.user.username)
         return render(request, 'posts/create_post.html', {'form': form})
     form = PostForm()
@@ -107,6 +239,9 @@ def post_edit(request, post_id):
     )
     if form.is_valid():
         form.save()
+        if 'image' in form.changed_data:
+            schedule_thumbnails(post)
+            schedule_variants(post)
         return redirect('posts:post_detail', post_id=post_id)
     context = {
         'post': post,
@@ -117,6 +252,7 @@ def post_edit(request, post_id):
 
 
 @login_required
+@transaction.atomic
 def add_comment(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
     form = CommentForm(request.POST or None)
@@ -130,31 +266,43 @@ def add_comment(request, post_id):
 
 @login_required
 def follow_index(request):
-    posts = Post.objects.filter(author__following__user=request.user)
-    page_obj = get_page_object(request, posts, NUMBER_OF_POSTS_DISPLAYED)
+    # Лента материализована (см. posts.feed): листаем готовые записи
+    # и одним запросом подтягиваем посты текущей страницы
+    paginator = feed.get_paginator(request.user, NUMBER_OF_POSTS_DISPLAYED)
+    page_obj = get_paginated_page(request, paginator)
+    post_ids = [entry.post_id for entry in page_obj.object_list]
+    posts = Post.objects.select_related('author', 'group').in_bulk(post_ids)
+    page_obj.object_list = [
+        posts[post_id] for post_id in post_ids if post_id in posts
+    ]
     context = {
         'title': 'Посты избранных авторов',
         'follow': True,
         'page_obj': page_obj,
+        **get_feed_cache_context(request, per_viewer=True),
     }
     return render(request, 'posts/follow.html', context)
 
 
 @login_required
+@transaction.atomic
 def profile_follow(request, username):
-    follower = Follow()
     if request.user.username == username:
         return redirect('posts:profile', username)
     author = get_object_or_404(User, username=username)
-    if Follow.objects.filter(user=request.user, author=author).exists():
+    # Граф подписок только для показа: его ответ может отставать от
+    # подписки, созданной в другом процессе, поэтому пишем через базу
+    _, created = Follow.objects.get_or_create(
+        user=request.user,
+        author=author
+    )
+    if not created:
         return redirect('posts:index')
-    follower.user = request.user
-    follower.author = author
-    follower.save()
     return redirect('posts:profile', username)
 
 
 @login_required
+@transaction.atomic
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
     following = Follow.objects.filter(user=request.user, author=author)
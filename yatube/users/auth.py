@@ -0,0 +1,75 @@
+"""
+Пользователь запроса из общего кэша.
+
+Снимок нужных страницам полей пользователя и хеш для проверки
+сессии хранятся в кэше, и пользователь собирается из них без
+запроса к auth_user. Остальные поля (password, email, ...) отложены
+и загружаются из базы при первом обращении. Снимок сбрасывается при
+сохранении и удалении пользователя (users.signals).
+"""
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth import (
+    BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY, get_user_model
+)
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.crypto import constant_time_compare
+
+User = get_user_model()
+
+CACHED_FIELDS = [
+    field.attname for field in User._meta.concrete_fields
+    if field.attname in {
+        'id',
+        'username',
+        'first_name',
+        'last_name',
+        'is_active',
+        'is_staff',
+        'is_superuser',
+    }
+]
+
+
+def user_key(user_id):
+    return f'user:{user_id}'
+
+
+def invalidate_user(user_id):
+    cache.delete(user_key(user_id))
+
+
+def cache_user(user):
+    cache.set(
+        user_key(user.pk),
+        {
+            'values': [getattr(user, field) for field in CACHED_FIELDS],
+            'session_hash': user.get_session_auth_hash(),
+        },
+        getattr(settings, 'USER_CACHE_TIMEOUT', 60 * 60)
+    )
+
+
+def get_user(request):
+    """Как django.contrib.auth.get_user, но сначала из кэша."""
+    session = request.session
+    try:
+        user_id = User._meta.pk.to_python(session[SESSION_KEY])
+        backend_path = session[BACKEND_SESSION_KEY]
+    except KeyError:
+        return AnonymousUser()
+    snapshot = cache.get(user_key(user_id))
+    backends = settings.AUTHENTICATION_BACKENDS
+    if snapshot is None or backend_path not in backends:
+        user = auth.get_user(request)
+        if user.is_authenticated:
+            cache_user(user)
+        return user
+    session_hash = session.get(HASH_SESSION_KEY) or ''
+    if not constant_time_compare(session_hash, snapshot['session_hash']):
+        session.flush()
+        return AnonymousUser()
+    # Поля вне CACHED_FIELDS остаются отложенными
+    return User.from_db(DEFAULT_DB_ALIAS, CACHED_FIELDS, snapshot['values'])
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
 import os
+import tempfile
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -54,7 +55,7 @@ MIDDLEWARE = [
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'users.middleware.CachedAuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -147,8 +148,61 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Кэш общий для всех процессов сервера (core.sqlite_cache)
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.sqlite_cache.SQLiteCache',
+        # Вне дерева исходников; на сервере — через переменную окружения
+        'LOCATION': os.environ.get(
+            'YATUBE_CACHE_LOCATION',
+            os.path.join(tempfile.gettempdir(), 'yatube-cache.sqlite3')
+        ),
+        'OPTIONS': {
+            'MAX_ENTRIES': 100_000,
+            # Время жизни и размер L1 в памяти каждого процесса
+            'L1_TIMEOUT': 1,
+            'L1_MAX_ENTRIES': 1000,
+        },
     }
 }
+
+# Тесты получают свой файл кэша (core.testing.isolated_cache)
+TEST_RUNNER = 'core.testing.TestRunner'
+
+# Сессии читаются из кэша, в базу пишутся после ответа (core.sessions)
+SESSION_ENGINE = 'core.sessions'
+# Время жизни снимка пользователя в кэше (users.auth)
+USER_CACHE_TIMEOUT = 60 * 60
+
+# Время жизни фрагментов лент: ключи версионированы (posts.caching)
+FEED_CACHE_TIMEOUT = 60 * 60
+# Время жизни карточек постов: ключ включает метку изменения поста
+POST_CARD_CACHE_TIMEOUT = 24 * 60 * 60
+# Время жизни страниц для анонимов: устаревшие снимаются тегами (posts.pagecache)
+PAGE_CACHE_TIMEOUT = 24 * 60 * 60
+
+# Длина материализованной ленты подписок (posts.feed)
+FOLLOW_FEED_LENGTH = 1000
+# Стратегия ленты подписок: 'push' или 'hybrid' (см. posts.feed)
+FOLLOW_FEED_STRATEGY = 'push'
+# С какого числа подписчиков посты автора читаются, а не раскладываются
+FOLLOW_FEED_CELEBRITY_THRESHOLD = 10000
+# Сколько пользователей держит граф подписок процесса (posts.follow_graph)
+FOLLOW_GRAPH_MAX_USERS = 10000
+
+# Потоков фоновой генерации миниатюр (posts.thumbnails); 0 — синхронно
+THUMBNAIL_WORKERS = 2
+# Ключи sorl-thumbnail хранятся только в кэше, без таблицы в БД
+THUMBNAIL_KVSTORE = 'core.kvstore.KVStore'
+
+# Загрузки крупнее этого пишутся во временный файл по частям
+FILE_UPLOAD_MAX_MEMORY_SIZE = 1024 * 1024
+# Картинки постов уменьшаются до этой длины большей стороны (posts.images)
+POST_IMAGE_MAX_SIZE = 2048
+# Картинки с большим числом пикселей отклоняются, не декодируясь
+POST_IMAGE_MAX_PIXELS = 50_000_000
+POST_IMAGE_QUALITY = 85
+# Процессов построения адаптивных вариантов (posts.variants); 0 — синхронно
+VARIANT_WORKERS = os.cpu_count()
+# Картинки не больше этого размера обрабатываются сразу, без очереди
+IMAGE_INLINE_MAX_BYTES = 64 * 1024